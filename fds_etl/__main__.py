@@ -1,4 +1,29 @@
-from fds_etl.src import main
+import argparse
+import sys
+
+from fds_etl.src import batch, main
+from fds_etl.src.config import load_config
 
 if __name__ == '__main__':
-    main.execute()
+    parser = argparse.ArgumentParser(prog='python -m fds_etl')
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help='clean one year of survey responses (the default)')
+    run_parser.add_argument('config', nargs='?', help='config file; defaults to $FDS_ETL_CONFIG or config.json')
+    validate_parser = subparsers.add_parser('validate', help='check the input files\' headers without cleaning anything')
+    validate_parser.add_argument('config', nargs='?', help='config file; defaults to $FDS_ETL_CONFIG or config.json')
+    batch_parser = subparsers.add_parser('batch', help='clean several years in parallel and combine their outputs')
+    batch_parser.add_argument('configs', nargs='+', help='one config file per year')
+    batch_parser.add_argument('--workers', type=int, help='number of worker processes (defaults to the number of CPUs)')
+    batch_parser.add_argument('--longform-output', action='append', default=[], help='combined longform output file (repeatable)')
+    batch_parser.add_argument('--shortform-output', action='append', default=[], help='combined shortform output file (repeatable)')
+    args = parser.parse_args()
+
+    if args.command == 'validate':
+        checks = main.check_input_schema(load_config(args.config))
+        report = checks.report()
+        print(report.to_string(index=False) if not report.empty else 'The input files match the configuration')
+        sys.exit(1 if checks.has_errors() else 0)
+    elif args.command == 'batch':
+        batch.execute_batch([load_config(path) for path in args.configs], args.workers, args.longform_output, args.shortform_output)
+    else:
+        main.execute(load_config(getattr(args, 'config', None)))
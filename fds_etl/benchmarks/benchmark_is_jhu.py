@@ -0,0 +1,33 @@
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import fds_etl.src.data_manipulation as dm
+from fds_etl.benchmarks.synthetic import RAW_COLUMN_NAMES, generate_responses
+
+
+def apply_is_jhu_column(df: pd.DataFrame) -> pd.DataFrame:
+    df['is_jhu'] = df.apply(lambda row: dm.is_jhu(row['employer_name']) or dm.is_jhu(row['cont_ed_school']), axis=1)
+    return df
+
+
+def make_frame(n_rows: int) -> pd.DataFrame:
+    responses = generate_responses(np.random.default_rng(0), 'u', 0, n_rows).rename(columns=RAW_COLUMN_NAMES)
+    return responses[['employer_name', 'cont_ed_school']].reset_index(drop=True)
+
+
+def run(n_rows: int, repeat: int = 3):
+    df = make_frame(n_rows)
+    apply_result = apply_is_jhu_column(df.copy())['is_jhu'].astype(bool)
+    vectorized_result = dm.add_is_jhu_column(df.copy())['is_jhu']
+    assert apply_result.equals(vectorized_result)
+    apply_time = min(timeit.repeat(lambda: apply_is_jhu_column(df.copy()), number=1, repeat=repeat))
+    vectorized_time = min(timeit.repeat(lambda: dm.add_is_jhu_column(df.copy()), number=1, repeat=repeat))
+    print(f'{n_rows} rows: apply {apply_time:.3f}s, vectorized {vectorized_time:.3f}s, '
+          f'speedup {apply_time / vectorized_time:.1f}x')
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import fds_etl.src.data_manipulation as dm
+import fds_etl.src.main as main
+from fds_etl.benchmarks.synthetic import generate_dataset
+from fds_etl.src.config import load_config
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# every other data_manipulation function is timed as the stage that wraps it, but these four all run in the single
+# RecodeRules pass of the apply_outcome_recodes stage, so they are also timed one by one, in the order they apply
+OUTCOME_RECODE_FUNCTIONS = [
+    ('recode_military_responses', dm.recode_military_responses),
+    ('recode_fellowship_responses', dm.recode_fellowship_responses),
+    ('split_working_outcomes_into_full_and_part_time', dm.split_working_outcomes_into_full_and_part_time),
+    ('split_still_looking_outcomes_into_work_and_school', dm.split_still_looking_outcomes_into_work_and_school),
+]
+
+
+def run(data_dir: str, n_rows: int, repeat: int, low_memory: bool = False, backend: str = 'pandas') -> dict:
+    config_path = os.path.join(data_dir, 'config.json')
+    if not os.path.exists(config_path):
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(generate_dataset(data_dir, n_rows), f, indent=2)
+    config = dict(load_config(config_path), low_memory=low_memory, backend=backend)
+
+    stage_seconds = {}
+    function_seconds = {}
+    df = None
+    for name, func in main.build_pipeline(config).stages + [('create_shortform_df', main.create_shortform_df)]:
+        stage_input = df
+        if name == 'apply_outcome_recodes':
+            function_seconds = _time_outcome_recode_functions(stage_input, repeat)
+        # the untimed first call also warms the in-process reference data caches
+        result = func(stage_input.copy() if stage_input is not None else None)
+        stage_seconds[name] = _best_time(lambda: func(stage_input.copy() if stage_input is not None else None), repeat)
+        if name == 'create_shortform_df':
+            shortform_df = result
+        else:
+            df = result
+    stage_seconds['ShortformAccumulator'] = _best_time(lambda: _accumulate_shortform(df), repeat)
+    main._load_reference_frame.cache_clear()
+    end_to_end_seconds = _best_time(lambda: main.execute(config), 1)
+    return {
+        'rows': len(df),
+        'stages': stage_seconds,
+        'functions': function_seconds,
+        'end_to_end': end_to_end_seconds,
+        'end_to_end_peak_mb': _peak_traced_mb(lambda: main.execute(config)),
+        'longform_hash': _frame_hash(df),
+        'shortform_hash': _frame_hash(shortform_df),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    problems = []
+    if results['rows'] != baseline['rows']:
+        return [f"baseline was recorded for {baseline['rows']} rows, not {results['rows']}"]
+    for kind in ['longform_hash', 'shortform_hash']:
+        if results[kind] != baseline[kind]:
+            problems.append(f'{kind.split("_")[0]} output differs from the baseline')
+    timings = dict(results['stages'], **results['functions'], end_to_end=results['end_to_end'])
+    baseline_timings = dict(baseline['stages'], **baseline.get('functions', {}), end_to_end=baseline['end_to_end'])
+    for name, seconds in timings.items():
+        if name not in baseline_timings:
+            continue
+        ratio = seconds / max(baseline_timings[name], 1e-9)
+        print(f'{name:55s} {baseline_timings[name]:10.4f}s -> {seconds:10.4f}s ({ratio:5.2f}x)')
+        # sub-millisecond stages are too noisy to flag
+        if ratio > 1 + tolerance and seconds - baseline_timings[name] > 1e-3:
+            problems.append(f'{name} is {ratio:.2f}x slower than the baseline')
+    if 'end_to_end_peak_mb' in baseline:
+        print(f"{'end_to_end_peak_mb':55s} {baseline['end_to_end_peak_mb']:9.1f}MB -> {results['end_to_end_peak_mb']:9.1f}MB")
+    return problems
+
+
+def _time_outcome_recode_functions(df: pd.DataFrame, repeat: int) -> dict:
+    seconds = {}
+    for name, func in OUTCOME_RECODE_FUNCTIONS:
+        stage_input = df
+        seconds[name] = _best_time(lambda: func(stage_input.copy()), repeat)
+        df = func(stage_input.copy())
+    return seconds
+
+
+def _accumulate_shortform(df: pd.DataFrame, chunk_size: int = 10_000) -> pd.DataFrame:
+    accumulator = dm.ShortformAccumulator(main.SHORTFORM_COLLAPSED_COLUMNS)
+    for start in range(0, len(df), chunk_size):
+        accumulator.add(df.iloc[start:start + chunk_size])
+    return accumulator.result()
+
+
+def _best_time(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_traced_mb(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def _frame_hash(df: pd.DataFrame) -> str:
+    return str(int(dm.hash_rows(df[sorted(df.columns)]).sum()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time every pipeline stage and main.execute on synthetic FDS data.')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--data-dir', help='reuse or create the synthetic dataset here instead of a temporary directory')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown before a stage is flagged')
+    parser.add_argument('--low-memory', action='store_true', help='run the pipeline with low_memory enabled')
+    parser.add_argument('--backend', choices=main.BACKENDS, default='pandas', help='compare a backend against a pandas baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        benchmark_results = run(data_dir, args.rows, args.repeat, args.low_memory, args.backend)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(benchmark_results, f, indent=2)
+        print(f'Saved baseline to {args.baseline}')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(benchmark_results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        sys.exit(1 if regressions else 0)
+    else:
+        print(json.dumps(benchmark_results, indent=2))
@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from fds_etl.src.writers import write_outputs
+
+EXCEL_MAX_DATA_ROWS = 1_048_575
+
+RAW_COLUMN_NAMES = {
+    'Response Status': 'response_status',
+    'Hopkins ID': 'hopkins_id',
+    'Outcome': 'outcome',
+    'Employer Name': 'employer_name',
+    'Job Title': 'job_title',
+    'Location': 'location',
+}
+DROPPED_COLUMNS = ['Response ID', 'Survey Name', 'Submitted At']
+
+OUTCOMES = ['Working', 'Continuing Education', 'Still Looking', 'Volunteering', 'Military', 'Not Seeking']
+OUTCOME_WEIGHTS = [0.55, 0.25, 0.1, 0.03, 0.02, 0.05]
+EMPLOYERS = ['Johns Hopkins APL', 'The Johns Hopkins Hospital', 'JHU School of Medicine', 'Accenture', 'Deloitte',
+             'Google', 'NIH', 'Teach For America', 'McKinsey & Company', 'Booz Allen Hamilton', 'Amazon', 'Pfizer']
+INDUSTRIES = ['Technology', 'Consulting', 'Healthcare', 'Education', 'Government', 'Finance']
+EMPLOYMENT_CATEGORIES = ['Organization', 'Self-Employed', 'Freelance']
+EMPLOYMENT_TYPES = ['Full-Time', 'Part-Time', 'Fellowship', 'Contract']
+JOB_TITLES = ['Analyst', 'Research Assistant', 'Software Engineer', 'Consultant', 'Teacher', 'Associate']
+SCHOOLS = ['Johns Hopkins Whiting School', 'Johns Hopkins Bloomberg School of Public Health', 'Harvard University',
+           'Stanford University', 'University of Maryland', 'Columbia University']
+STILL_SEEKING_OPTIONS = ['Employment', 'Continuing Education']
+MILITARY_BRANCHES = ['U.S. Army', 'U.S. Navy', 'U.S. Air Force', 'U.S. Marine Corps']
+MILITARY_RANKS = ['Officer', 'Enlisted']
+MILITARY_SPECIALIZATIONS = ['Health Services Administration', 'Logistics', 'Intelligence', 'Engineering']
+ACTIVITIES = ['Independent research with a faculty member', 'Other research', 'Internship/practicum', 'Study abroad',
+              'On campus job', 'Leadership in student organization', 'Entrepreneurship', 'Experiential learning trip',
+              'Community impact and service', 'Connection with a mentor']
+LOCATIONS = [
+    ('Baltimore, MD', 'Baltimore', 'Maryland', 'United States'),
+    ('Washington, DC', 'Washington', 'District of Columbia', 'United States'),
+    ('New York, NY', 'New York', 'New York', 'United States'),
+    ('Boston, MA', 'Boston', 'Massachusetts', 'United States'),
+    ('San Francisco, CA', 'San Francisco', 'California', 'United States'),
+    ('Seattle, WA', 'Seattle', 'Washington', 'United States'),
+    ('Philadelphia, PA', 'Philadelphia', 'Pennsylvania', 'United States'),
+    ('Bethesda, MD', 'Bethesda', 'Maryland', 'United States'),
+    ('Chicago, IL', 'Chicago', 'Illinois', 'United States'),
+    ('London, United Kingdom', 'London', None, 'United Kingdom'),
+    ('Shanghai, China', 'Shanghai', None, 'China'),
+    ('Toronto, Canada', 'Toronto', 'Ontario', 'Canada'),
+]
+# spellings that Handshake exports contain but the mapping file does not
+UNMAPPED_LOCATION_VARIANTS = ['baltimore, md', 'New York,NY', 'Washington D.C.', 'Boston, MA ']
+MAJORS_BY_COLLEGE = {
+    'Krieger School of Arts and Sciences': ['Biology', 'Economics', 'English', 'History', 'Psychology', 'Public Health Studies'],
+    'Whiting School of Engineering': ['Biomedical Engineering', 'Computer Science', 'Applied Mathematics and Statistics',
+                                      'Chemical and Biomolecular Engineering', 'Mechanical Engineering'],
+}
+UNDERGRADUATE_DEGREES = ['B.A.', 'B.S.']
+MASTERS_DEGREES = ['M.S.', 'M.A.', 'M.S.E.']
+
+
+def generate_dataset(output_dir: str, n_rows: int, seed: int = 0, masters_share: float = 0.3,
+                     chunk_rows: int = 500_000) -> dict:
+    """Writes a synthetic Handshake FDS export of about n_rows response rows plus matching reference files.
+
+    The ETL reads demographics from an Excel workbook, so when there are more students than an Excel sheet has
+    rows, only the first EXCEL_MAX_DATA_ROWS students get demographics and the rest are left without them.
+    Returns a config dict for the dataset whose outputs go to output_dir/output.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(output_dir, 'output'), exist_ok=True)
+    config = {
+        'source_files': {
+            'undergraduate': [os.path.join(output_dir, 'undergraduate.csv')],
+            'masters': [os.path.join(output_dir, 'masters.csv')],
+        },
+        'dropped_columns_file': os.path.join(output_dir, 'dropped_columns.csv'),
+        'column_name_mapping_file': os.path.join(output_dir, 'column_name_mapping.csv'),
+        'student_demographics_file': os.path.join(output_dir, 'student_demographics.xlsx'),
+        'location_mapping_file': os.path.join(output_dir, 'location_mapping.xlsx'),
+        'fds_year': '2020-2021',
+        'longform_output_files': [os.path.join(output_dir, 'output', 'longform.xlsx')],
+        'shortform_output_files': [os.path.join(output_dir, 'output', 'shortform.xlsx')],
+    }
+    student_ids = []
+    masters_rows = int(n_rows * masters_share)
+    for filepath, level, level_rows in [(config['source_files']['undergraduate'][0], 'u', n_rows - masters_rows),
+                                        (config['source_files']['masters'][0], 'm', masters_rows)]:
+        written_rows, next_student = 0, 0
+        while written_rows < level_rows or written_rows == 0:
+            chunk = generate_responses(rng, level, next_student, min(chunk_rows, max(level_rows - written_rows, 1)))
+            chunk.to_csv(filepath, mode='a' if written_rows else 'w', header=not written_rows, index=False)
+            student_ids.append(chunk['Hopkins ID'].drop_duplicates())
+            written_rows += len(chunk)
+            next_student += chunk['Hopkins ID'].nunique()
+    with open(config['dropped_columns_file'], 'w', encoding='utf-8') as f:
+        f.write('\n'.join(DROPPED_COLUMNS) + '\n')
+    with open(config['column_name_mapping_file'], 'w', encoding='utf-8') as f:
+        f.write('raw_name,clean_name\n')
+        f.writelines(f'{raw},{clean}\n' for raw, clean in RAW_COLUMN_NAMES.items())
+    write_outputs([
+        (generate_demographics(rng, pd.concat(student_ids, ignore_index=True)), [config['student_demographics_file']]),
+        (pd.DataFrame(LOCATIONS, columns=['raw_location', 'city', 'state', 'country']), [config['location_mapping_file']]),
+    ])
+    return config
+
+
+def generate_responses(rng: np.random.Generator, level: str, first_student: int, n_rows: int) -> pd.DataFrame:
+    majors_per_student = rng.choice([1, 2, 3], size=max(int(n_rows / 1.3), 1), p=[0.75, 0.2, 0.05])
+    majors_per_student = majors_per_student[:np.searchsorted(np.cumsum(majors_per_student), n_rows) + 1]
+    n_students = len(majors_per_student)
+    students = pd.DataFrame({
+        'Hopkins ID': level + pd.Series(np.arange(first_student, first_student + n_students)).astype(str).str.zfill(8),
+        'Response Status': rng.choice(['submitted', 'in_progress'], size=n_students, p=[0.9, 0.1]),
+        'Outcome': rng.choice(OUTCOMES, size=n_students, p=OUTCOME_WEIGHTS),
+    })
+    is_working = (students['Outcome'] == 'Working').to_numpy()
+    is_military = (students['Outcome'] == 'Military').to_numpy()
+    is_cont_ed = (students['Outcome'] == 'Continuing Education').to_numpy()
+    is_still_looking = (students['Outcome'] == 'Still Looking').to_numpy()
+    students['Employer Name'] = _where(is_working, rng.choice(EMPLOYERS, size=n_students))
+    students['Job Title'] = _where(is_working, rng.choice(JOB_TITLES, size=n_students))
+    students['employer_industry'] = _where(is_working, rng.choice(INDUSTRIES, size=n_students))
+    students['employment_category'] = _where(is_working, rng.choice(EMPLOYMENT_CATEGORIES, size=n_students))
+    students['employment_type'] = _where(is_working, rng.choice(EMPLOYMENT_TYPES, size=n_students, p=[0.7, 0.15, 0.05, 0.1]))
+    students['is_internship'] = _where(is_working, rng.random(n_students) < 0.1)
+    students['is_fellowship'] = _where(is_working & (rng.random(n_students) < 0.05), 'Yes')
+    students['pay_schedule'] = _where(is_working, rng.choice(['Annually', 'Hourly'], size=n_students))
+    students['military_branch'] = _where(is_military, rng.choice(MILITARY_BRANCHES, size=n_students))
+    students['military_rank'] = _where(is_military, rng.choice(MILITARY_RANKS, size=n_students))
+    students['military_specialization'] = _where(is_military, rng.choice(MILITARY_SPECIALIZATIONS, size=n_students))
+    students['cont_ed_school'] = _where(is_cont_ed, rng.choice(SCHOOLS, size=n_students))
+    students['still_seeking_option'] = _where(is_still_looking, rng.choice(STILL_SEEKING_OPTIONS, size=n_students))
+    for nps_column in ['ldl_nps_1', 'ldl_nps_2', 'ldl_nps_3']:
+        scores = rng.integers(0, 11, size=n_students).astype(float)
+        scores[rng.random(n_students) < 0.15] = np.nan
+        students[nps_column] = scores
+    activity_combinations = np.array([
+        ', '.join(np.array(ACTIVITIES)[rng.random(len(ACTIVITIES)) < 0.2]) or None for _ in range(512)
+    ], dtype=object)
+    students['activities_at_jhu'] = activity_combinations[rng.integers(0, len(activity_combinations), size=n_students)]
+    locations = np.array([location[0] for location in LOCATIONS] + UNMAPPED_LOCATION_VARIANTS, dtype=object)
+    students['Location'] = _where(is_working, locations[rng.integers(0, len(locations), size=n_students)])
+    students['Survey Name'] = 'First Destination Survey'
+    students['Submitted At'] = '2021-06-30'
+
+    responses = students.loc[np.repeat(np.arange(n_students), majors_per_student)].reset_index(drop=True)
+    colleges = np.array(list(MAJORS_BY_COLLEGE), dtype=object)
+    college = colleges[rng.integers(0, len(colleges), size=len(responses))]
+    major_index = rng.integers(0, 1000, size=len(responses))
+    responses['jhu_college'] = college
+    responses['jhu_major'] = [MAJORS_BY_COLLEGE[c][i % len(MAJORS_BY_COLLEGE[c])] for c, i in zip(college, major_index)]
+    responses['jhu_degree'] = rng.choice(UNDERGRADUATE_DEGREES if level == 'u' else MASTERS_DEGREES, size=len(responses))
+    responses['Response ID'] = np.arange(len(responses))
+    return responses.iloc[:n_rows]
+
+
+def generate_demographics(rng: np.random.Generator, student_ids: pd.Series) -> pd.DataFrame:
+    if len(student_ids) > EXCEL_MAX_DATA_ROWS:
+        print(f'Only the first {EXCEL_MAX_DATA_ROWS} of {len(student_ids)} students fit in the demographics workbook; '
+              f'the responses of the other students get no demographics')
+        student_ids = student_ids.iloc[:EXCEL_MAX_DATA_ROWS]
+    demographics = pd.DataFrame({'hopkins_id': student_ids.str.upper()})
+    for column, share in [('is_athlete', 0.1), ('is_first_gen', 0.15), ('is_pell_eligible', 0.2), ('is_urm', 0.25)]:
+        values = (rng.random(len(demographics)) < share).astype(float)
+        values[rng.random(len(demographics)) < 0.05] = np.nan
+        demographics[column] = values
+    return demographics
+
+
+def _where(condition: np.ndarray, values) -> np.ndarray:
+    values = np.broadcast_to(np.asarray(values, dtype=object), condition.shape)
+    return np.where(condition, values, None)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a synthetic FDS dataset and its config.')
+    parser.add_argument('output_dir')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    dataset_config = generate_dataset(args.output_dir, args.rows, args.seed)
+    with open(os.path.join(args.output_dir, 'config.json'), 'w', encoding='utf-8') as config_file:
+        json.dump(dataset_config, config_file, indent=2)
@@ -0,0 +1,48 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List
+
+import pandas as pd
+
+import fds_etl.src.main as main
+from fds_etl.src.writers import OutputTarget, group_targets_by_format, write_outputs
+
+
+def execute_batch(configs: List[dict], max_workers: int = None, longform_output_files: List[OutputTarget] = (),
+                  shortform_output_files: List[OutputTarget] = (), output_workers: int = None):
+    """Cleans every year's config in a pool of processes, then writes the combined outputs.
+
+    Pool processes are reused across configs, and main caches reference files per process, so each worker
+    parses a shared reference file once however many years it cleans. The combined outputs are built from
+    the Parquet output each year wrote, in the order of the configs. Every year's input headers, and that
+    it writes the Parquet outputs to combine, are checked first, so any year can fail the batch before
+    any year is cleaned.
+    """
+    for config in configs:
+        main.preflight(config)
+        if longform_output_files:
+            parquet_output_path(config['longform_output_files'])
+        if shortform_output_files:
+            parquet_output_path(config['shortform_output_files'])
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # the inputs were checked above, so the workers skip the check
+        list(executor.map(partial(main.execute, check_inputs=False), configs))
+    outputs = []
+    if longform_output_files:
+        outputs.append((combine_outputs([config['longform_output_files'] for config in configs]), longform_output_files))
+    if shortform_output_files:
+        outputs.append((combine_outputs([config['shortform_output_files'] for config in configs]), shortform_output_files))
+    # the combined outputs are formatted like the first year's
+    write_outputs(outputs, output_workers, main.output_column_formats(configs[0]))
+
+
+def combine_outputs(targets_by_config: List[List[OutputTarget]]) -> pd.DataFrame:
+    return pd.concat([pd.read_parquet(parquet_output_path(targets)) for targets in targets_by_config], ignore_index=True)
+
+
+def parquet_output_path(targets: List[OutputTarget]) -> str:
+    # CSV and Excel outputs lose dtypes and may hold values already rendered by the column format rules
+    paths_by_format = group_targets_by_format(targets)
+    if 'parquet' not in paths_by_format:
+        raise ValueError(f'None of {targets} is a Parquet output; every year needs one to combine the outputs')
+    return paths_by_format['parquet'][0]
@@ -1,12 +1,13 @@
 import json
+import os
 import pathlib
+from typing import Union
 
-config_filepath = pathlib.Path(__file__).parent.parent.parent / 'config.json'
 
-
-def load_config() -> dict:
-    with open(config_filepath) as f:
-        return json.load(f)
+def default_config_filepath() -> pathlib.Path:
+    return pathlib.Path(os.environ.get('FDS_ETL_CONFIG', pathlib.Path(__file__).parent.parent.parent / 'config.json'))
 
 
-CONFIG = load_config()
+def load_config(filepath: Union[str, pathlib.Path] = None) -> dict:
+    with open(filepath or default_config_filepath()) as f:
+        return json.load(f)
@@ -1,95 +1,476 @@
+import heapq
+import itertools
+import numbers
+import os
 import re
-from typing import List, Dict
+import tempfile
+from typing import Dict, Iterator, List, Union
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pandas.api.types import is_bool_dtype, is_categorical_dtype, is_numeric_dtype
+
+from fds_etl.src.recodes import RecodeRules
+
+
+MILITARY_RECODE_RULES = [
+    {
+        'name': 'military',
+        'when': {'column': 'military_branch', 'not_blank': True},
+        'set': {
+            'employer_industry': 'Defense',
+            'employment_category': 'Organization',
+            'employment_type': 'Full-Time',
+            'is_internship': False,
+            'employer_name': {'column': 'military_branch'},
+            'job_title': {'concat': [{'column': 'military_specialization'}, ' ', {'column': 'military_rank'}]},
+        },
+        'drop': ['military_branch', 'military_rank', 'military_specialization'],
+    },
+]
+
+FELLOWSHIP_RECODE_RULES = [
+    {
+        'name': 'fellowship',
+        'when': {'any': [{'column': 'is_fellowship', 'equals': 'Yes'}, {'column': 'employment_type', 'equals': 'Fellowship'}]},
+        'set': {'outcome': 'Fellowship', 'fellowship_org': {'column': 'employer_name'}},
+        'drop': ['is_fellowship'],
+    },
+]
+
+# internships come first so that a full-time internship is not recoded as full-time work
+WORKING_RECODE_RULES = [
+    {
+        'name': 'working_internship',
+        'when': {'all': [{'column': 'outcome', 'equals': 'Working'}, {'column': 'is_internship', 'equals': True}]},
+        'set': {'outcome': 'Working (Part-Time/Internship)'},
+    },
+    {
+        'name': 'working_part_time',
+        'when': {'all': [{'column': 'outcome', 'equals': 'Working'}, {'column': 'employment_type', 'equals': 'Part-Time'}]},
+        'set': {'outcome': 'Working (Part-Time/Internship)'},
+    },
+    {
+        'name': 'working_full_time',
+        'when': {'all': [{'column': 'outcome', 'equals': 'Working'}, {'column': 'employment_type', 'equals': 'Full-Time'}]},
+        'set': {'outcome': 'Working (Full-Time)'},
+        'drop': ['is_internship', 'employment_type'],
+    },
+]
+
+STILL_LOOKING_RECODE_RULES = [
+    {
+        'name': 'still_looking_employment',
+        'when': {'all': [{'column': 'outcome', 'equals': 'Still Looking'}, {'column': 'still_seeking_option', 'equals': 'Employment'}]},
+        'set': {'outcome': 'Still Looking (Employment)'},
+    },
+    {
+        'name': 'still_looking_cont_ed',
+        'when': {'all': [{'column': 'outcome', 'equals': 'Still Looking'}, {'column': 'still_seeking_option', 'equals': 'Continuing Education'}]},
+        'set': {'outcome': 'Still Looking (Continuing Education)'},
+        'drop': ['still_seeking_option'],
+    },
+]
+
+OUTCOME_RECODE_RULES = MILITARY_RECODE_RULES + FELLOWSHIP_RECODE_RULES + WORKING_RECODE_RULES + STILL_LOOKING_RECODE_RULES
+
+
+def apply_outcome_recodes(df: pd.DataFrame, rules: List[dict] = None) -> pd.DataFrame:
+    return RecodeRules(rules or OUTCOME_RECODE_RULES).apply(df)
 
 
 def recode_military_responses(df: pd.DataFrame) -> pd.DataFrame:
-    military_responses = ~df['military_branch'].isna() & ~(df['military_branch'] == '')
-    df.loc[military_responses, ['employer_industry', 'employment_category', 'employment_type', 'is_internship']] = [
-        'Defense',  # industry
-        'Organization',  # category
-        'Full-Time',  # type,
-        False,  # is_internship
-    ]
-    df.loc[military_responses, 'employer_name'] = df.loc[military_responses, 'military_branch']
-    job_title = df.loc[military_responses, 'military_specialization'] + ' ' + df.loc[military_responses, 'military_rank']
-    df.loc[military_responses, 'job_title'] = job_title
-    df = df.drop(columns=['military_branch', 'military_rank', 'military_specialization'])
-    return df
+    return RecodeRules(MILITARY_RECODE_RULES).apply(df)
+
+
+DEFAULT_JHU_PATTERNS = [r'johns\s+hopkins']
+
 
+def is_jhu(org_name: str, jhu_patterns: List[str] = None) -> bool:
+    """Whether a JHU pattern matches anywhere in the lowercased name, on any of its lines.
 
-def is_jhu(org_name: str) -> bool:
+    Names are lowercased as they always were, so e.g. a dotted capital I, which lowercases to i and a
+    combining dot, does not match an i. The patterns also ignore case, so patterns spelled in capitals
+    still match.
+    """
     if not isinstance(org_name, str):
         return False
     else:
-        return org_name and re.match(r'.*johns\s+hopkins.*', org_name.lower()) is not None
+        pattern = '|'.join(jhu_patterns or DEFAULT_JHU_PATTERNS)
+        return bool(org_name) and re.search(pattern, org_name.lower(), flags=re.IGNORECASE) is not None
 
 
-def add_is_jhu_column(df: pd.DataFrame) -> pd.DataFrame:
-    df['is_jhu'] = df.apply(lambda row: is_jhu(row['employer_name']) or is_jhu(row['cont_ed_school']), axis=1)
+def add_is_jhu_column(df: pd.DataFrame, jhu_patterns: List[str] = None) -> pd.DataFrame:
+    """Adds is_jhu, matching the names as is_jhu does."""
+    pattern = re.compile('|'.join(jhu_patterns or DEFAULT_JHU_PATTERNS), flags=re.IGNORECASE)
+    df['is_jhu'] = _contains_pattern(df['employer_name'], pattern) | _contains_pattern(df['cont_ed_school'], pattern)
     return df
 
 
-def recode_response_status_as_is_submitted(df: pd.DataFrame) -> pd.DataFrame:
-    df['is_submitted'] = df['response_status'] == 'submitted'
-    return df.drop(columns=['response_status'])
+def _contains_pattern(series: pd.Series, pattern: re.Pattern) -> pd.Series:
+    if is_categorical_dtype(series):
+        # match each category once instead of every row
+        matches = _contains_pattern(pd.Series(series.cat.categories), pattern).to_numpy()
+        return pd.Series(np.append(matches, False)[series.cat.codes.to_numpy()], index=series.index)
+    if is_arrow_string_dtype(series):
+        values = pa.array(series.array)
+        matches = pc.match_substring_regex(values, pattern.pattern, ignore_case=bool(pattern.flags & re.IGNORECASE))
+        matches = pd.Series(matches.fill_null(False).to_numpy(zero_copy_only=False), index=series.index)
+        # RE2 and Python's re agree on printable ASCII, where lowercasing changes nothing an ignore-case match
+        # would not, but not on what \s, case folding or $ make of other characters, such as a no-break space,
+        # so those rows are lowercased and matched with re
+        other = pc.match_substring_regex(values, '[^ -~]').fill_null(False).to_numpy(zero_copy_only=False)
+        if other.any():
+            matches[other] = _contains_pattern(series[other].astype(object), pattern).to_numpy()
+        return matches
+    # columns that were entirely blank in the source CSVs are read as float and have no .str accessor
+    if not (pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+        return pd.Series(False, index=series.index)
+    return series.str.lower().str.contains(pattern, na=False).astype(bool)
+
+
+def recode_response_status_as_is_submitted(df: pd.DataFrame, drop: bool = True) -> pd.DataFrame:
+    # Arrow string comparisons leave missing statuses missing rather than False
+    df['is_submitted'] = (df['response_status'] == 'submitted').to_numpy(dtype=bool, na_value=False)
+    return df.drop(columns=['response_status']) if drop else df
+
+
+NPS_COLUMNS = ['ldl_nps_1', 'ldl_nps_2', 'ldl_nps_3']
 
 
-def add_consolidated_ldl_nps_columns(df: pd.DataFrame) -> pd.DataFrame:
-    nps_columns = ['ldl_nps_1', 'ldl_nps_2', 'ldl_nps_3']
-    df['avg_ldl_nps'] = df[nps_columns].mean(axis=1)
-    df['max_ldl_nps'] = df[nps_columns].max(axis=1)
-    df['min_ldl_nps'] = df[nps_columns].min(axis=1)
-    return df.drop(columns=nps_columns)
+def add_consolidated_ldl_nps_columns(df: pd.DataFrame, drop: bool = True) -> pd.DataFrame:
+    df['avg_ldl_nps'] = df[NPS_COLUMNS].mean(axis=1)
+    df['max_ldl_nps'] = df[NPS_COLUMNS].max(axis=1)
+    df['min_ldl_nps'] = df[NPS_COLUMNS].min(axis=1)
+    return df.drop(columns=NPS_COLUMNS) if drop else df
 
 
 def split_working_outcomes_into_full_and_part_time(df: pd.DataFrame) -> pd.DataFrame:
-    part_time_rows = (df['outcome'] == 'Working') & (df['employment_type'] == 'Part-Time')
-    full_time_rows = (df['outcome'] == 'Working') & (df['employment_type'] == 'Full-Time')
-    internships = (df['outcome'] == 'Working') & (df['is_internship'] == True)
-    df.loc[part_time_rows, 'outcome'] = 'Working (Part-Time/Internship)'
-    df.loc[full_time_rows, 'outcome'] = 'Working (Full-Time)'
-    df.loc[internships, 'outcome'] = 'Working (Part-Time/Internship)'
-    return df.drop(columns=['is_internship', 'employment_type'])
+    return RecodeRules(WORKING_RECODE_RULES).apply(df)
 
 
 def split_still_looking_outcomes_into_work_and_school(df: pd.DataFrame) -> pd.DataFrame:
-    still_looking_employment_rows = (df['outcome'] == 'Still Looking') & (df['still_seeking_option'] == 'Employment')
-    still_looking_cont_ed_rows = (df['outcome'] == 'Still Looking') & (df['still_seeking_option'] == 'Continuing Education')
-    df.loc[still_looking_employment_rows, 'outcome'] = 'Still Looking (Employment)'
-    df.loc[still_looking_cont_ed_rows, 'outcome'] = 'Still Looking (Continuing Education)'
-    return df.drop(columns=['still_seeking_option'])
+    return RecodeRules(STILL_LOOKING_RECODE_RULES).apply(df)
 
 
 def recode_fellowship_responses(df: pd.DataFrame) -> pd.DataFrame:
-    is_fellowship = (df['is_fellowship'] == 'Yes') | (df['employment_type'] == 'Fellowship')
-    df.loc[is_fellowship, 'outcome'] = 'Fellowship'
-    df.loc[is_fellowship, 'fellowship_org'] = df.loc[is_fellowship, 'employer_name']
-    return df.drop(columns=['is_fellowship'])
+    return RecodeRules(FELLOWSHIP_RECODE_RULES).apply(df)
 
 
-def recode_boolean_columns_to_excel_friendly_strings(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
-    df[columns] = df[columns].fillna('').replace({0: 'FALSE', 1: 'TRUE'})
+def categorize_low_cardinality_columns(df: pd.DataFrame, max_unique_ratio: float, exclude: List[str] = ()) -> pd.DataFrame:
+    """Converts text columns with few distinct values relative to their length to categoricals."""
+    for col in df.columns:
+        if col in exclude or not (pd.api.types.is_object_dtype(df[col]) or is_arrow_string_dtype(df[col])):
+            continue
+        # factorize once to both count the distinct values and build the categorical
+        codes, uniques = pd.factorize(df[col])
+        if len(uniques) <= max_unique_ratio * len(df):
+            df[col] = pd.Categorical.from_codes(codes, categories=pd.Index(uniques, dtype=object))
+    return df
+
+
+def convert_text_columns_to_arrow(df: pd.DataFrame) -> pd.DataFrame:
+    """Stores text columns as Arrow strings, which take far less memory than Python string objects and are
+    matched with Arrow's compute kernels instead of row by row."""
+    # the values are known to be strings, so they are handed to Arrow directly instead of through astype's checks
+    converted = {col: pd.arrays.ArrowStringArray(pa.array(df[col].to_numpy(), type=pa.string(), from_pandas=True))
+                 for col in df.columns
+                 if pd.api.types.is_object_dtype(df[col]) and pd.api.types.infer_dtype(df[col], skipna=True) == 'string'}
+    if not converted:
+        return df
+    # replacing the columns one at a time would rewrite the block of object columns they share every time
+    return pd.concat([df.drop(columns=list(converted)), pd.DataFrame(converted, index=df.index)], axis=1)[df.columns]
+
+
+def is_arrow_string_dtype(series: pd.Series) -> bool:
+    return isinstance(series.dtype, pd.StringDtype) and series.dtype.storage == 'pyarrow'
+
+
+def constant_column(value, length: int) -> pd.Categorical:
+    """A column holding one value in every row, stored as a single category instead of per-row strings."""
+    return pd.Categorical.from_codes(np.zeros(length, dtype=np.int8), categories=[value])
+
+
+def convert_flag_columns_to_booleans(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Stores 0/1 flag columns as nullable booleans; how they are spelled in an output is up to its writer."""
+    for col in columns:
+        # a column holding anything but 0/1 flags is left as it is
+        if df[col].dropna().isin([0, 1]).all():
+            df[col] = df[col].astype('boolean')
     return df
 
 
 def expand_experiential_learning_column(df: pd.DataFrame, value_to_col_name_map: Dict[str, str]) -> pd.DataFrame:
-    for value, col_name in value_to_col_name_map.items():
-        df[col_name] = df['activities_at_jhu'].str.contains(value)
+    # a response is one of relatively few distinct combinations of selected activities, so match every
+    # activity against each distinct response once and let rows look their response up by its code
+    codes, responses = pd.factorize(df['activities_at_jhu'])
+    values = list(value_to_col_name_map)
+    matches = np.zeros((len(responses) + 1, len(values)), dtype=bool)  # the extra last row serves missing responses (code -1)
+    for i, response in enumerate(responses):
+        if isinstance(response, str):
+            matches[i] = [value in response for value in values]
+    is_missing = codes == -1
+    row_matches = matches[codes]
+    for i, col_name in enumerate(value_to_col_name_map.values()):
+        df[col_name] = pd.arrays.BooleanArray(row_matches[:, i], is_missing.copy())
     return df
 
 
 def create_shortform_df(df: pd.DataFrame, cols_to_collapse: List[str]) -> pd.DataFrame:
-    id_vars = list(filter(lambda x: x not in cols_to_collapse, df.columns))
-    # need to temporarily fill all na with a placeholder because of bug in Pandas 1.1
-    # that breaks the dropna parameter of df.groupby()
-    temp_na_replacement = '!@2#3$4%5^6&~~~~'
-    shortform_df = df \
-        .fillna(temp_na_replacement) \
-        .groupby(by=id_vars)[cols_to_collapse] \
-        .agg({col: lambda x: '; '.join(sorted(set(x))) for col in cols_to_collapse}) \
-        .reset_index() \
-        .replace({temp_na_replacement: np.nan})
-    return shortform_df
+    id_vars = [col for col in df.columns if col not in cols_to_collapse]
+    group_keys = _surrogate_group_keys(df, id_vars)
+    n_groups = group_keys.max() + 1 if len(group_keys) else 0
+    first_rows = np.unique(group_keys, return_index=True)[1]
+    shortform_df = df[id_vars].iloc[first_rows].reset_index(drop=True)
+    for col in cols_to_collapse:
+        shortform_df[col] = _join_unique_values_by_group(group_keys, df[col], n_groups)
+    return _sort_shortform_df(shortform_df, id_vars)
+
+
+def sort_shortform_df(shortform_df: pd.DataFrame, cols_to_collapse: List[str]) -> pd.DataFrame:
+    """Sorts a shortform frame built piecewise into the order create_shortform_df returns."""
+    return _sort_shortform_df(shortform_df, [col for col in shortform_df.columns if col not in cols_to_collapse])
+
+
+# a merge holds a row group of every run it reads, so at most this many runs are merged at a time
+MERGE_FAN_IN = 16
+MIN_SPILL_ROW_GROUP_ROWS = 256
+
+
+class ShortformAccumulator:
+    """Builds the same result as create_shortform_df from a stream of longform chunks, without keeping them in memory.
+
+    Each chunk is spilled to a temporary Parquet file, sorted by a byte key that encodes its id columns in
+    output order. batches() merges the files by that key, which brings the rows of every group together in
+    output order, and collapses each group as soon as all of its rows have been read. Memory follows the
+    chunk size rather than the number of responses.
+    """
+
+    def __init__(self, cols_to_collapse: List[str]):
+        self.cols_to_collapse = cols_to_collapse
+        self.batch_rows = 1
+        self.columns = None
+        self._arrow_string_columns = set()
+        self._runs = []
+        self._temp_dir = None
+        self._spill_count = 0
+
+    def add(self, df: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        elif set(df.columns) != set(self.columns):
+            raise ValueError(f'A chunk has the columns {list(df.columns)}, but the first chunk added had {self.columns}')
+        df = df[self.columns]
+        self.batch_rows = max(self.batch_rows, len(df))
+        id_vars = self._id_vars()
+        self._arrow_string_columns |= {col for col in id_vars if is_arrow_string_dtype(df[col])}
+        # the key orders rows the way _sort_shortform_df does, and rows share a key exactly when they share a group
+        keys = _sort_keys(df, id_vars)
+        # collapsed values are joined as text anyway, and as text they are Parquet-storable in every chunk
+        values = {col: df[col].astype(str).where(df[col].notna()).astype(object) for col in self.cols_to_collapse}
+        spilled = df[id_vars].assign(**values, _key=keys)
+        self._runs.append([self._spill(spilled.iloc[np.argsort(keys, kind='stable')])])
+
+    def batches(self) -> Iterator[pd.DataFrame]:
+        """Yields the shortform frame in order, about batch_rows rows at a time. Can only be called once."""
+        try:
+            carried = None
+            for table in self._merge(self._runs):
+                batch = self._to_pandas(table)
+                if carried is not None:
+                    batch = pd.concat([carried, batch], ignore_index=True)
+                # the rows of a merged batch's last group may continue in the next batch
+                # (compared as a Series, since numpy would turn the bytes into a fixed-width string and drop trailing NULs)
+                continues = (batch['_key'] == batch['_key'].iloc[-1]).to_numpy()
+                carried = batch[continues]
+                if not continues.all():
+                    yield self._collapse(batch[~continues])
+            if carried is not None:
+                yield self._collapse(carried)
+        finally:
+            if self._temp_dir is not None:
+                self._temp_dir.cleanup()
+
+    def result(self) -> pd.DataFrame:
+        batches = list(self.batches())
+        return pd.concat(batches, ignore_index=True) if batches else pd.DataFrame(columns=self.columns)
+
+    def _to_pandas(self, table: pa.Table) -> pd.DataFrame:
+        df = table.to_pandas()
+        # Parquet only records that a column held pandas strings, which come back Python-backed
+        for col in self._arrow_string_columns:
+            if col in table.column_names and pa.types.is_string(table.column(col).type):
+                df[col] = pd.arrays.ArrowStringArray(table.column(col).combine_chunks())
+        return df
+
+    def _id_vars(self) -> List[str]:
+        return [col for col in self.columns if col not in self.cols_to_collapse]
+
+    def _collapse(self, rows: pd.DataFrame) -> pd.DataFrame:
+        keys = rows['_key'].to_numpy()
+        starts_group = np.r_[True, keys[1:] != keys[:-1]]
+        group_keys = np.cumsum(starts_group) - 1
+        shortform_df = rows.loc[starts_group, self._id_vars()].reset_index(drop=True)
+        for col in self.cols_to_collapse:
+            shortform_df[col] = _join_unique_values_by_group(group_keys, rows[col], len(shortform_df))
+        return shortform_df
+
+    def _merge(self, runs: List[List[str]]) -> Iterator[pa.Table]:
+        while len(runs) > MERGE_FAN_IN:
+            merged_runs = []
+            for i in range(0, len(runs), MERGE_FAN_IN):
+                merged_runs.append([self._spill(table) for table in _merge_runs(runs[i:i + MERGE_FAN_IN], '_key', self.batch_rows)])
+                for path in itertools.chain.from_iterable(runs[i:i + MERGE_FAN_IN]):
+                    os.remove(path)
+            runs = merged_runs
+        return _merge_runs(runs, '_key', self.batch_rows)
+
+    def _spill(self, rows: Union[pd.DataFrame, pa.Table]) -> str:
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.TemporaryDirectory(prefix='fds-etl-shortform-')
+        path = os.path.join(self._temp_dir.name, f'{self._spill_count}.parquet')
+        self._spill_count += 1
+        table = rows if isinstance(rows, pa.Table) else pa.Table.from_pandas(rows, preserve_index=False)
+        # small row groups let a merge read a little of every run at a time
+        pq.write_table(table, path, row_group_size=max(self.batch_rows // MERGE_FAN_IN, MIN_SPILL_ROW_GROUP_ROWS))
+        return path
+
+
+def _merge_runs(runs: List[List[str]], by: str, batch_rows: int) -> Iterator[pa.Table]:
+    """Merges runs, each a list of Parquet files whose rows are sorted by the `by` column, into sorted tables
+    of batch_rows rows. Rows that tie keep the order of their runs. Only the row groups holding rows that
+    have not been merged yet are kept in memory."""
+    row_groups = {}
+    row_group_ids = itertools.count()
+
+    def run_rows(run: int):
+        for path in runs[run]:
+            parquet_file = pq.ParquetFile(path)
+            for i in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(i)
+                row_group_id = next(row_group_ids)
+                row_groups[row_group_id] = [table, table.num_rows]
+                for position, value in enumerate(table.column(by).to_pylist()):
+                    # the row group id is increasing within a run, so ties never compare further
+                    yield value, run, row_group_id, position
+
+    merged = heapq.merge(*(run_rows(run) for run in range(len(runs))))
+    while True:
+        taken = list(itertools.islice(merged, batch_rows))
+        if not taken:
+            return
+        ids = np.array([row[2] for row in taken])
+        positions = np.array([row[3] for row in taken])
+        pieces, rows = [], []
+        for row_group_id in np.unique(ids):
+            in_row_group = np.flatnonzero(ids == row_group_id)
+            table, remaining = row_groups[row_group_id]
+            pieces.append(table.take(positions[in_row_group]))
+            rows.append(in_row_group)
+            if remaining == len(in_row_group):
+                del row_groups[row_group_id]
+            else:
+                row_groups[row_group_id][1] -= len(in_row_group)
+        # take every row group's rows at once, then put them back in merged order
+        yield _concat_tables(pieces).take(np.argsort(np.concatenate(rows)))
+
+
+def _concat_tables(tables: List[pa.Table]) -> pa.Table:
+    # runs spilled from different chunks can disagree on a column's type, e.g. int64 and double
+    try:
+        return pa.concat_tables(tables, promote_options='permissive')
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.Table.from_pandas(pd.concat([table.to_pandas() for table in tables], ignore_index=True), preserve_index=False)
+
+
+def _sort_keys(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Encodes every row's values in `columns` as bytes that compare in the order _sort_shortform_df sorts
+    the rows in: column by column, missing values first, then numbers, then text by code point."""
+    keys = np.empty(len(df), dtype=object)
+    keys[:] = [b''.join(row) for row in zip(*(_sort_key_column(df[col]) for col in columns))] if columns else b''
+    return keys
+
+
+def _sort_key_column(values: pd.Series) -> np.ndarray:
+    # encode each distinct value once; code -1 (missing) picks the trailing missing-value key
+    if is_categorical_dtype(values):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    encoded = np.empty(len(uniques) + 1, dtype=object)
+    if is_numeric_dtype(uniques):
+        encoded[:-1] = _encode_numbers(np.asarray(uniques, dtype='float64'))
+    else:
+        encoded[:-1] = [_sort_key_value(value) for value in uniques]
+    encoded[-1] = b'\x00'
+    return encoded[codes]
+
+
+def _sort_key_value(value) -> bytes:
+    if isinstance(value, str):
+        # escaping NULs and ending with two of them makes a prefix sort before the longer text
+        return b'\x02' + value.encode('utf-8').replace(b'\x00', b'\x00\xff') + b'\x00\x00'
+    if pd.isna(value):
+        return b'\x00'
+    if isinstance(value, numbers.Number):
+        return _encode_numbers(np.array([value], dtype='float64'))[0]
+    return _sort_key_value(str(value))
+
+
+def _encode_numbers(floats: np.ndarray) -> np.ndarray:
+    # adding 0.0 turns -0.0 into 0.0; flipping the sign bit of positives and every bit of negatives
+    # makes the big-endian bytes of the floats compare like the floats
+    bits = (floats + 0.0).view(np.uint64)
+    bits = np.where(bits >> np.uint64(63) == 1, ~bits, bits | np.uint64(1 << 63))
+    raw = bits.astype('>u8').tobytes()
+    encoded = np.empty(len(floats), dtype=object)
+    encoded[:] = [b'\x01' + raw[i:i + 8] for i in range(0, len(raw), 8)]
+    return encoded
+
+
+def hash_rows(df: pd.DataFrame) -> np.ndarray:
+    # the same value can arrive as int64, float64 or object depending on what else is in its chunk,
+    # so hash every column through one common representation
+    normalized = pd.DataFrame({
+        col: (df[col].astype('float64') if is_numeric_dtype(df[col]) and not is_bool_dtype(df[col]) else df[col]).astype(object)
+        for col in df.columns
+    })
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+def _sort_shortform_df(shortform_df: pd.DataFrame, id_vars: List[str]) -> pd.DataFrame:
+    # categoricals sort by category order, which depends on how the categories were built; sort by value instead
+    return shortform_df.sort_values(by=id_vars, na_position='first', kind='mergesort',
+                                    key=lambda col: col.astype(object) if is_categorical_dtype(col) else col).reset_index(drop=True)
+
+
+def _surrogate_group_keys(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    # factorize one column at a time and re-densify the combined codes after each step,
+    # so the key stays an exact, NaN-safe int64 id no matter how many columns are grouped on
+    group_keys = np.zeros(len(df), dtype=np.int64)
+    for col in columns:
+        codes, uniques = pd.factorize(df[col])
+        group_keys, _ = pd.factorize(group_keys * (len(uniques) + 1) + (codes + 1))
+    return group_keys
+
+
+def _join_unique_values_by_group(group_keys: np.ndarray, values: pd.Series, n_groups: int) -> np.ndarray:
+    pairs = pd.DataFrame({'group': group_keys, 'value': values.to_numpy()}) \
+        .dropna() \
+        .drop_duplicates()
+    pairs['value'] = pairs['value'].astype(str)
+    pairs = pairs.sort_values(by=['group', 'value'])
+    joined = np.full(n_groups, np.nan, dtype=object)
+    if pairs.empty:
+        return joined
+    groups = pairs['group'].to_numpy()
+    starts_group = np.r_[True, groups[1:] != groups[:-1]]
+    # prefix every value except the first of its group with the separator, then concatenate
+    # each group's run of values with a single reduceat instead of a per-group join
+    values = np.where(starts_group, pairs['value'], '; ' + pairs['value']).astype(object)
+    group_starts = np.flatnonzero(starts_group)
+    joined[groups[group_starts]] = np.add.reduceat(values, group_starts)
+    return joined
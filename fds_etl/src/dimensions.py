@@ -0,0 +1,67 @@
+from typing import Callable, List
+
+import pandas as pd
+
+ON_DUPLICATE_OPTIONS = ['first', 'error']
+
+
+def normalize_key(keys: pd.Series) -> pd.Series:
+    return keys.astype(object).str.strip().str.lower()
+
+
+class DimensionLookup:
+    """Attaches a dimension table's columns to rows by key, like a left many-to-one merge.
+
+    The dimension is indexed once on its normalized key. A key that appears more than once is resolved to
+    its first row, or rejected with on_duplicate='error', so attaching never changes the number of rows;
+    duplicate_report() lists such keys. Columns are assigned to the frame in place rather than merged
+    into a copy of it.
+    """
+
+    def __init__(self, dimension: pd.DataFrame, key_column: str, columns: List[str] = None,
+                 on_duplicate: str = 'first', normalize: Callable[[pd.Series], pd.Series] = normalize_key):
+        if on_duplicate not in ON_DUPLICATE_OPTIONS:
+            raise ValueError(f'Unknown on_duplicate "{on_duplicate}"; expected one of {ON_DUPLICATE_OPTIONS}')
+        columns = [col for col in dimension.columns if col != key_column] if columns is None else list(columns)
+        missing_columns = [col for col in columns if col not in dimension.columns]
+        if missing_columns:
+            raise ValueError(f'Columns {missing_columns} are not in the dimension table')
+        self.key_column = key_column
+        self.columns = columns
+        self.normalize = normalize
+        keys = normalize(dimension[key_column]).reset_index(drop=True)
+        dimension = dimension.reset_index(drop=True)
+        is_duplicate = keys.notna() & keys.duplicated(keep=False)
+        self._duplicates = _duplicate_report(keys[is_duplicate], dimension.loc[is_duplicate, columns], key_column)
+        if on_duplicate == 'error' and not self._duplicates.empty:
+            raise ValueError(f'{len(self._duplicates)} {key_column} values appear more than once in the dimension table, '
+                             f'e.g. {self._duplicates[key_column].iloc[0]!r}')
+        kept = keys.notna() & ~keys.duplicated(keep='first')
+        self._index = pd.Index(keys[kept])
+        self._values = dimension.loc[kept, columns].reset_index(drop=True)
+        self.matched_rows = 0
+        self.unmatched_rows = 0
+
+    def attach(self, df: pd.DataFrame, on: str = None) -> pd.DataFrame:
+        positions = self._index.get_indexer(self.normalize(df[on or self.key_column]))
+        matched = int((positions >= 0).sum())
+        self.matched_rows += matched
+        self.unmatched_rows += len(positions) - matched
+        # position -1 is not a label of the values' RangeIndex, so unmatched rows get missing values
+        looked_up = self._values.reindex(positions)
+        for col in self.columns:
+            df[col] = looked_up[col].to_numpy()
+        return df
+
+    def duplicate_report(self) -> pd.DataFrame:
+        return self._duplicates
+
+
+def _duplicate_report(keys: pd.Series, rows: pd.DataFrame, key_column: str) -> pd.DataFrame:
+    grouped = rows.groupby(keys.to_numpy(), sort=True)
+    report = pd.DataFrame({
+        'rows': grouped.size(),
+        # duplicates whose attached columns disagree change the output depending on which row is kept
+        'conflicting': grouped.nunique(dropna=False).gt(1).any(axis=1) if rows.columns.size else False,
+    })
+    return report.rename_axis(key_column).reset_index()
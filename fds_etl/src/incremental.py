@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import fds_etl.src.data_manipulation as dm
+from fds_etl.src.reference_cache import file_content_hash
+
+KEY_COLUMNS = ['hopkins_id', 'education_level']
+
+SETTINGS_FILENAME = 'settings.json'
+FINGERPRINTS_FILENAME = 'fingerprints.parquet'
+LONGFORM_FILENAME = 'longform.parquet'
+SHORTFORM_FILENAME = 'shortform.parquet'
+SUMMARY_CELLS_FILENAME = 'summary_cells.parquet'
+
+
+def key_hashes(df: pd.DataFrame) -> np.ndarray:
+    return dm.hash_rows(df[KEY_COLUMNS])
+
+
+def fingerprint_responses(raw_df: pd.DataFrame, keys: np.ndarray) -> pd.Series:
+    """Returns one fingerprint per response key, indexed by the key's hash.
+
+    A key's fingerprint is the wrapping sum of the hashes of all of its raw rows, so it does not depend on
+    row order but changes whenever any of the key's rows (e.g. one of several majors) is added, removed or edited.
+    """
+    if raw_df.empty:
+        return pd.Series([], dtype=np.uint64)
+    row_hashes = dm.hash_rows(raw_df[sorted(raw_df.columns)])
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    fingerprints = np.add.reduceat(row_hashes[order], group_starts)
+    return pd.Series(fingerprints, index=sorted_keys[group_starts], dtype=np.uint64)
+
+
+def find_stale_keys(previous: pd.Series, current: pd.Series) -> np.ndarray:
+    """Returns the hashes of keys that are new, changed or gone since the previous run."""
+    both = previous.index.intersection(current.index)
+    changed = both[previous[both].to_numpy() != current[both].to_numpy()]
+    added = current.index.difference(previous.index)
+    removed = previous.index.difference(current.index)
+    return np.concatenate([changed.to_numpy(), added.to_numpy(), removed.to_numpy()]).astype(np.uint64)
+
+
+def replace_stale_rows(previous_df: pd.DataFrame, delta_df: pd.DataFrame, stale_keys: np.ndarray) -> pd.DataFrame:
+    kept_df = previous_df[~np.isin(key_hashes(previous_df), stale_keys)]
+    if delta_df.empty:
+        return kept_df.reset_index(drop=True)
+    return pd.concat([kept_df, delta_df.reindex(columns=previous_df.columns)], ignore_index=True)
+
+
+def order_like_source(df: pd.DataFrame, source_keys: np.ndarray) -> pd.DataFrame:
+    """Puts cleaned rows back in the order of their raw rows, which is the order a full run produces.
+
+    Cleaning keeps one row per raw row, so the nth row of a key takes the position of the key's nth raw row.
+    """
+    keys = key_hashes(df)
+    source_positions = pd.Series(np.arange(len(source_keys)), index=[source_keys, _occurrences(source_keys)])
+    positions = source_positions.reindex(pd.MultiIndex.from_arrays([keys, _occurrences(keys)])).to_numpy()
+    return df.iloc[np.argsort(positions, kind='stable')].reset_index(drop=True)
+
+
+def _occurrences(keys: np.ndarray) -> np.ndarray:
+    return pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy()
+
+
+def load_state(state_dir: str, settings_hash: str) -> Optional[Tuple[pd.Series, pd.DataFrame, pd.DataFrame]]:
+    """Returns the previous run's (fingerprints, longform, shortform), or None if a full run is needed."""
+    settings_path = os.path.join(state_dir, SETTINGS_FILENAME)
+    if not os.path.exists(settings_path):
+        return None
+    with open(settings_path, encoding='utf-8') as f:
+        if json.load(f).get('settings_hash') != settings_hash:
+            return None
+    fingerprints = pd.read_parquet(os.path.join(state_dir, FINGERPRINTS_FILENAME))
+    return (
+        pd.Series(fingerprints['fingerprint'].to_numpy(), index=fingerprints['key'].to_numpy()),
+        pd.read_parquet(os.path.join(state_dir, LONGFORM_FILENAME)),
+        pd.read_parquet(os.path.join(state_dir, SHORTFORM_FILENAME)),
+    )
+
+
+def load_summary_cells(state_dir: str) -> Optional[pd.DataFrame]:
+    """Returns the summary cells saved with the previous run's state, or None if it had no summary."""
+    path = os.path.join(state_dir, SUMMARY_CELLS_FILENAME)
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def save_state(state_dir: str, settings_hash: str, fingerprints: pd.Series, longform_df: pd.DataFrame, shortform_df: pd.DataFrame,
+               summary_cells: pd.DataFrame = None):
+    os.makedirs(state_dir, exist_ok=True)
+    # remove the settings first so an interrupted save is treated as missing state rather than reused
+    settings_path = os.path.join(state_dir, SETTINGS_FILENAME)
+    if os.path.exists(settings_path):
+        os.remove(settings_path)
+    pd.DataFrame({'key': fingerprints.index.to_numpy(), 'fingerprint': fingerprints.to_numpy()}) \
+        .to_parquet(os.path.join(state_dir, FINGERPRINTS_FILENAME), index=False)
+    longform_df.to_parquet(os.path.join(state_dir, LONGFORM_FILENAME), index=False)
+    shortform_df.to_parquet(os.path.join(state_dir, SHORTFORM_FILENAME), index=False)
+    summary_cells_path = os.path.join(state_dir, SUMMARY_CELLS_FILENAME)
+    if summary_cells is not None:
+        summary_cells.to_parquet(summary_cells_path, index=False)
+    elif os.path.exists(summary_cells_path):
+        # cells left from an earlier run would miss this run's changes
+        os.remove(summary_cells_path)
+    with open(settings_path, 'w', encoding='utf-8') as f:
+        json.dump({'settings_hash': settings_hash}, f)
+
+
+def settings_hash(config: dict, ignored_keys: List[str], reference_files: List[str]) -> str:
+    """Hashes everything besides the responses themselves that affects the cleaned output."""
+    settings = {key: value for key, value in config.items() if key not in ignored_keys}
+    settings['reference_files'] = {path: file_content_hash(path) for path in reference_files}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()
@@ -0,0 +1,119 @@
+import difflib
+import os
+import re
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LEARNED_COLUMNS = ['normalized_location', 'raw_location', 'method', 'mapping_version']
+
+
+def normalize_location(location: str) -> str:
+    location = re.sub(r"[.'\"]", '', location.casefold())
+    location = re.sub(r'[^\w\s]', ' ', location)
+    return ' '.join(location.split())
+
+
+class LocationResolver:
+    """Resolves raw survey locations to rows of the location mapping.
+
+    Each distinct location is looked up by its exact spelling, then by its normalized spelling (case,
+    whitespace and punctuation ignored), then in the learned resolutions of earlier runs, then by its sorted
+    tokens, and only then, if a fuzzy_cutoff is given, matched fuzzily on those tokens. Every resolution is memoized, so repeat runs cost one dict
+    lookup per distinct location. Unmatched locations are remembered only for the mapping and fuzzy cutoff
+    they were checked against, so they are retried once either changes.
+    """
+
+    def __init__(self, mapping: pd.DataFrame, learned: pd.DataFrame = None, fuzzy_cutoff: Optional[float] = None,
+                 key_column: str = 'raw_location'):
+        mapping = mapping.drop_duplicates(subset=key_column).reset_index(drop=True)
+        self.key_column = key_column
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.targets = mapping.drop(columns=[key_column])
+        self.mapping_version = str(int(pd.util.hash_pandas_object(mapping[key_column], index=False).sum()))
+        if fuzzy_cutoff is not None:
+            # a location left unmatched is also retried once the fuzzy cutoff changes
+            self.mapping_version += f'~{fuzzy_cutoff}'
+        self._keys = mapping[key_column].tolist()
+        self._exact_index = {key: i for i, key in enumerate(self._keys)}
+        self._normalized_index = {}
+        for i, key in enumerate(self._keys):
+            if isinstance(key, str):
+                self._normalized_index.setdefault(normalize_location(key), i)
+        self._token_index = {}
+        for normalized, i in self._normalized_index.items():
+            self._token_index.setdefault(_sorted_tokens(normalized), i)
+        self._learned = {}
+        self._resolved = {}
+        self._unmatched_counts = {}
+        if learned is not None:
+            self._load_learned(learned)
+
+    def resolve(self, locations: pd.Series) -> pd.DataFrame:
+        """Returns the mapping's target columns for every location, aligned with the given series."""
+        codes, distinct_locations = pd.factorize(locations)
+        distinct_indices = np.array([self._resolve_one(location) for location in distinct_locations] + [-1], dtype=np.int64)
+        row_indices = distinct_indices[codes]
+        unmatched_counts = np.bincount(codes[(codes >= 0) & (row_indices == -1)], minlength=len(distinct_locations))
+        for location, count in zip(distinct_locations, unmatched_counts):
+            if count:
+                self._unmatched_counts[location] = self._unmatched_counts.get(location, 0) + int(count)
+        return self.targets.reindex(row_indices).set_axis(locations.index, axis=0)
+
+    def learned_mapping(self) -> pd.DataFrame:
+        rows = [(normalized, self._keys[i] if i >= 0 else None, method, self.mapping_version if i < 0 else None)
+                for normalized, (i, method) in self._learned.items()]
+        return pd.DataFrame(rows, columns=LEARNED_COLUMNS)
+
+    def unmatched_report(self) -> pd.DataFrame:
+        report = pd.DataFrame(list(self._unmatched_counts.items()), columns=['location', 'responses'])
+        report.insert(1, 'normalized_location', report['location'].map(normalize_location))
+        return report.sort_values(by='responses', ascending=False, kind='mergesort').reset_index(drop=True)
+
+    def _resolve_one(self, location) -> int:
+        if not isinstance(location, str):
+            return -1
+        if location not in self._resolved:
+            index = self._exact_index.get(location)
+            self._resolved[location] = index if index is not None else self._resolve_normalized(normalize_location(location))
+        return self._resolved[location]
+
+    def _resolve_normalized(self, normalized: str) -> int:
+        # the mapping comes before learned resolutions, so a row added to correct a wrong fuzzy match takes effect
+        if normalized in self._normalized_index:
+            self._learned[normalized] = (self._normalized_index[normalized], 'normalized')
+        elif normalized not in self._learned:
+            self._learned[normalized] = self._match_tokens(normalized)
+        return self._learned[normalized][0]
+
+    def _match_tokens(self, normalized: str) -> Tuple[int, str]:
+        tokens = _sorted_tokens(normalized)
+        if tokens in self._token_index:
+            return self._token_index[tokens], 'word_order'
+        if self.fuzzy_cutoff is not None:
+            matches = difflib.get_close_matches(tokens, list(self._token_index), n=1, cutoff=self.fuzzy_cutoff)
+            if matches:
+                return self._token_index[matches[0]], 'fuzzy'
+        return -1, 'unmatched'
+
+    def _load_learned(self, learned: pd.DataFrame):
+        for row in learned.itertuples(index=False):
+            if row.method == 'unmatched':
+                if row.mapping_version == self.mapping_version:
+                    self._learned[row.normalized_location] = (-1, row.method)
+            elif row.method == 'fuzzy' and self.fuzzy_cutoff is None:
+                # fuzzy matches of runs that allowed them are not reused by runs that do not
+                continue
+            elif row.raw_location in self._exact_index:
+                self._learned[row.normalized_location] = (self._exact_index[row.raw_location], row.method)
+
+
+def read_learned_mapping(filepath: Optional[str]) -> Optional[pd.DataFrame]:
+    if not filepath or not os.path.exists(filepath):
+        return None
+    return pd.read_csv(filepath, dtype=str, keep_default_na=False, na_values=[''])
+
+
+def _sorted_tokens(normalized: str) -> str:
+    return ' '.join(sorted(normalized.split()))
@@ -1,84 +1,441 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 
 import fds_etl.src.data_manipulation as dm
-from fds_etl.src.config import CONFIG
+import fds_etl.src.incremental as incremental
+from fds_etl.src.dimensions import DimensionLookup
 from fds_etl.src.file_parsers import csv_to_dict, single_column_to_list
+from fds_etl.src.locations import LocationResolver, read_learned_mapping
+from fds_etl.src.pipeline import Pipeline
+from fds_etl.src.preflight import SchemaPreflight, read_header
+from fds_etl.src.recodes import RecodeRules
+from fds_etl.src.reference_cache import ReferenceCache
+from fds_etl.src.summary import SummaryCube
+from fds_etl.src.writers import StreamingOutputWriter, validate_column_formats, write_outputs
+
+SHORTFORM_COLLAPSED_COLUMNS = ['jhu_major', 'jhu_degree', 'jhu_college']
+
+BACKENDS = ['pandas', 'arrow']
+
+DEMOGRAPHIC_FLAG_COLUMNS = ['is_athlete', 'is_first_gen', 'is_pell_eligible', 'is_urm']
+
+# the demographic flags that are attached are added to these
+SUMMARY_DIMENSIONS = ['fds_year', 'education_level', 'jhu_college', 'jhu_degree', 'jhu_major']
+# grouping by every subset of nine dimensions makes the summary larger than the longform output
+SUMMARY_MAX_DIMENSIONS = 3
 
+# Excel readers of the outputs expect the demographic flags spelled out, and blank where unknown
+DEFAULT_COLUMN_FORMATS = [
+    {'columns': DEMOGRAPHIC_FLAG_COLUMNS, 'formats': ['xlsx'], 'true': 'TRUE', 'false': 'FALSE', 'missing': ''},
+]
 
-def execute():
-    df = read_raw_response_data()
-    df = drop_unnecessary_columns(df)
-    df = rename_columns(df)
-    df = add_student_demographic_data(df)
-    df = add_fds_year(df)
-    df = split_locations_into_city_state_country(df)
-    df = add_cont_ed_major_supplemental_info(df)
-    df = dm.recode_response_status_as_is_submitted(df)
-    df = dm.recode_military_responses(df)
-    df = dm.recode_fellowship_responses(df)
-    df = dm.split_working_outcomes_into_full_and_part_time(df)
-    df = dm.split_still_looking_outcomes_into_work_and_school(df)
-    df = dm.add_consolidated_ldl_nps_columns(df)
-    df = dm.add_is_jhu_column(df)
-    df = expand_activities_at_jhu_into_multiple_columns(df)
-    df = recode_boolean_columns_to_excel_friendly_strings(df)
-    df = drop_columns_needed_for_cleaning_but_not_for_analysis(df)
-    shortform_df = dm.create_shortform_df(df, ['jhu_major', 'jhu_degree', 'jhu_college'])
+
+def execute(config: dict, check_inputs: bool = True):
+    if check_inputs:
+        preflight(config)
+    # invalid column format rules would otherwise only fail once everything is cleaned
+    output_column_formats(config)
+    resolver = location_resolver(config)
+    pipeline = build_pipeline(config, resolver)
+    if config.get('incremental_state_dir'):
+        execute_incremental(pipeline, config, config['incremental_state_dir'])
+    elif config.get('chunk_size'):
+        execute_streaming(pipeline, config, config['chunk_size'])
+    else:
+        execute_in_memory(pipeline, config)
+    save_location_resolutions(config, resolver)
+    if config.get('profile_report_file'):
+        pipeline.write_profile_report(config['profile_report_file'])
+
+
+def execute_in_memory(pipeline: Pipeline, config: dict):
+    df = pipeline.run(None, start=config.get('start_stage'), stop=config.get('stop_stage'))
+    if pipeline.stopped:
+        return
+    shortform_df = pipeline.run_stage('create_shortform_df', create_shortform_df, df)
     print(df.info())
     print(shortform_df.info())
-    for filepath in CONFIG['longform_output_files']:
-        df.to_excel(filepath, index=False)
-    for filepath in CONFIG['shortform_output_files']:
-        shortform_df.to_excel(filepath, index=False)
+    outputs = [(df, config['longform_output_files']), (shortform_df, config['shortform_output_files'])]
+    if config.get('summary_output_files'):
+        cube = summary_cube(config, df.columns)
+        summary_df = pipeline.run_stage('create_summary_df', lambda _: cube.rollup(cube.aggregate(df)), None)
+        outputs.append((summary_df, config['summary_output_files']))
+    pipeline.run_stage('write_outputs', lambda _: write_outputs(outputs, config.get('output_workers'), output_column_formats(config)), None)
+
+
+def execute_streaming(pipeline: Pipeline, config: dict, chunk_size: int):
+    shortform = dm.ShortformAccumulator(SHORTFORM_COLLAPSED_COLUMNS)
+    cube, summary_cells = None, []
+    with StreamingOutputWriter(config['longform_output_files'], output_column_formats(config)) as longform_writer:
+        for chunk in read_raw_response_data_in_chunks(config, chunk_size):
+            chunk = clean_response_data(pipeline, chunk)
+            longform_writer.write(chunk)
+            shortform.add(chunk)
+            if config.get('summary_output_files'):
+                cube = cube or summary_cube(config, chunk.columns)
+                summary_cells.append(pipeline.run_stage('aggregate_summary_cells', cube.aggregate, chunk))
+    pipeline.run_stage('create_shortform_df', lambda _: write_shortform_batches(config, shortform), None)
+    if cube is not None:
+        summary_df = pipeline.run_stage('create_summary_df', lambda _: cube.rollup(cube.merge(summary_cells)), None)
+        outputs = [(summary_df, config['summary_output_files'])]
+        pipeline.run_stage('write_outputs', lambda _: write_outputs(outputs, config.get('output_workers'), output_column_formats(config)), None)
+
+
+def write_shortform_batches(config: dict, shortform: dm.ShortformAccumulator):
+    # the shortform is written as it is collapsed, so it is never held in memory either
+    with StreamingOutputWriter(config['shortform_output_files'], output_column_formats(config)) as shortform_writer:
+        for batch in shortform.batches():
+            shortform_writer.write(batch)
+
+
+def preflight(config: dict):
+    """Fails before any data is loaded when the input files' headers do not match what the stages expect."""
+    report = check_input_schema(config).report()
+    for problem in report[report['severity'] == 'warning'].itertuples(index=False):
+        print(f'Warning: {problem.file}: {problem.column} {problem.problem}')
+    errors = report[report['severity'] == 'error']
+    if not errors.empty:
+        raise ValueError(f'{len(errors)} input schema errors (run "python -m fds_etl validate" to list them with the warnings):\n'
+                         + '\n'.join(f'{problem.file}: {problem.column} {problem.problem}' for problem in errors.itertuples(index=False)))
+
+
+def check_input_schema(config: dict) -> SchemaPreflight:
+    checks = SchemaPreflight()
+    sources = [filepath for filepath, _ in list_source_files(config)]
+    reference_files = {key: config[key] for key in ['dropped_columns_file', 'column_name_mapping_file', 'column_dtypes_file',
+                                                    'student_demographics_file', 'location_mapping_file'] if key in config}
+    if not checks.check_files_exist(dict(reference_files, **{filepath: filepath for filepath in sources})):
+        return checks
+    # education_level is added to every source file's rows when they are read
+    headers = {filepath: read_header(filepath) + ['education_level'] for filepath in sources}
+    checks.check_source_headers(headers, read_dropped_columns(config), read_column_name_map(config),
+                                required_response_columns(config), read_column_dtypes(config))
+    checks.check_reference_header('student_demographics_file', read_header(config['student_demographics_file']),
+                                  ['hopkins_id'] + list(config.get('demographic_columns', [])))
+    checks.check_reference_header('location_mapping_file', read_header(config['location_mapping_file']), ['raw_location'])
+    return checks
+
+
+def required_response_columns(config: dict) -> Dict[str, List[str]]:
+    """The cleaned response columns each stage reads."""
+    return {
+        'add_student_demographic_data': ['hopkins_id'],
+        'split_locations_into_city_state_country': ['location'],
+        'recode_response_status_as_is_submitted': ['response_status'],
+        'apply_outcome_recodes': outcome_recode_rules(config).required_columns,
+        'add_consolidated_ldl_nps_columns': dm.NPS_COLUMNS,
+        'add_is_jhu_column': ['employer_name', 'cont_ed_school'],
+        'expand_activities_at_jhu_into_multiple_columns': ['activities_at_jhu'],
+        'drop_columns_needed_for_cleaning_but_not_for_analysis': ['pay_schedule'],
+        'create_shortform_df': SHORTFORM_COLLAPSED_COLUMNS,
+    }
+
+
+def build_pipeline(config: dict, resolver: LocationResolver = None) -> Pipeline:
+    low_memory = bool(config.get('low_memory'))
+    recode_rules = outcome_recode_rules(config)
+    # with low_memory, the stages leave the columns they consume in place and the last stage drops them all at once
+    deferred_columns = ['location', 'response_status'] + dm.NPS_COLUMNS + recode_rules.dropped_columns if low_memory else []
+    stages = [
+        ('read_raw_response_data', lambda _: read_raw_response_data(config)),
+        ('rename_columns', partial(rename_columns, column_name_map=read_column_name_map(config))),
+        ('add_student_demographic_data', partial(add_student_demographic_data, lookup=student_demographics_lookup(config))),
+        ('add_fds_year', partial(add_fds_year, fds_year=config['fds_year'], low_memory=low_memory)),
+        ('split_locations_into_city_state_country', partial(split_locations_into_city_state_country,
+                                                            resolver=resolver or location_resolver(config), low_memory=low_memory)),
+        ('add_cont_ed_major_supplemental_info', partial(add_cont_ed_major_supplemental_info, low_memory=low_memory)),
+        ('recode_response_status_as_is_submitted', partial(recode_response_status_as_is_submitted, low_memory=low_memory)),
+        ('apply_outcome_recodes', partial(apply_outcome_recodes, rules=recode_rules, low_memory=low_memory)),
+        ('add_consolidated_ldl_nps_columns', partial(add_consolidated_ldl_nps_columns, low_memory=low_memory)),
+        ('add_is_jhu_column', partial(add_is_jhu_column, jhu_patterns=config.get('jhu_patterns'))),
+        ('expand_activities_at_jhu_into_multiple_columns', expand_activities_at_jhu_into_multiple_columns),
+        ('convert_demographic_flags_to_booleans', convert_demographic_flags_to_booleans),
+        ('drop_columns_needed_for_cleaning_but_not_for_analysis',
+         partial(drop_columns_needed_for_cleaning_but_not_for_analysis, deferred_columns=deferred_columns)),
+    ]
+    return Pipeline(stages, profile=bool(config.get('profile_report_file')), checkpoint_dir=config.get('checkpoint_dir'))
+
+
+def clean_response_data(pipeline: Pipeline, df: pd.DataFrame) -> pd.DataFrame:
+    # every stage after reading the raw responses works row by row, so it can also run on a chunk or a delta
+    return pipeline.run(df, start='rename_columns', checkpoint=False)
+
+
+def create_shortform_df(df: pd.DataFrame) -> pd.DataFrame:
+    return dm.create_shortform_df(df, SHORTFORM_COLLAPSED_COLUMNS)
+
+
+def execute_incremental(pipeline: Pipeline, config: dict, state_dir: str):
+    raw_df = pipeline.run_stage('read_raw_response_data', lambda _: read_raw_response_data(config), None)
+    keys = incremental.key_hashes(raw_df.rename(columns=read_column_name_map(config), copy=False))
+    fingerprints = incremental.fingerprint_responses(raw_df, keys)
+    settings_hash = incremental_settings_hash(config)
+    state = incremental.load_state(state_dir, settings_hash)
+    stale_rows = None
+    if state is None:
+        df = clean_response_data(pipeline, raw_df)
+        shortform_df = pipeline.run_stage('create_shortform_df', create_shortform_df, df)
+    else:
+        previous_fingerprints, previous_df, previous_shortform_df = state
+        stale_keys = incremental.find_stale_keys(previous_fingerprints, fingerprints)
+        delta_df = raw_df[np.isin(keys, stale_keys)].reset_index(drop=True)
+        print(f'Reprocessing {len(delta_df)} of {len(raw_df)} responses')
+        if not delta_df.empty:
+            delta_df = clean_response_data(pipeline, delta_df)
+        df = incremental.order_like_source(incremental.replace_stale_rows(previous_df, delta_df, stale_keys), keys)
+        delta_shortform_df = pipeline.run_stage('create_shortform_df', create_shortform_df, delta_df) if not delta_df.empty else delta_df
+        shortform_df = dm.sort_shortform_df(incremental.replace_stale_rows(previous_shortform_df, delta_shortform_df, stale_keys),
+                                            SHORTFORM_COLLAPSED_COLUMNS)
+        # the summary cells that held the old or the new version of a reprocessed response
+        stale_rows = [previous_df[np.isin(incremental.key_hashes(previous_df), stale_keys)], delta_df]
+    outputs = [(df, config['longform_output_files']), (shortform_df, config['shortform_output_files'])]
+    summary_cells = None
+    if config.get('summary_output_files'):
+        cube = summary_cube(config, df.columns)
+        previous_cells = incremental.load_summary_cells(state_dir) if stale_rows is not None else None
+        if previous_cells is None or previous_cells.columns[:len(cube.dimensions)].tolist() != cube.dimensions:
+            summary_cells = pipeline.run_stage('aggregate_summary_cells', cube.aggregate, df)
+        else:
+            summary_cells = pipeline.run_stage('update_summary_cells', lambda _: cube.update(previous_cells, df, stale_rows), None)
+        outputs.append((pipeline.run_stage('create_summary_df', cube.rollup, summary_cells), config['summary_output_files']))
+    incremental.save_state(state_dir, settings_hash, fingerprints, df, shortform_df, summary_cells)
+    pipeline.run_stage('write_outputs', lambda _: write_outputs(outputs, config.get('output_workers'), output_column_formats(config)), None)
+
+
+def incremental_settings_hash(config: dict) -> str:
+    # the summary settings only change what is aggregated from the cleaned rows, which the state keeps
+    ignored_keys = ['longform_output_files', 'shortform_output_files', 'output_workers', 'ingest_workers',
+                   'summary_output_files', 'summary_dimensions', 'summary_max_dimensions',
+                   'source_files', 'incremental_state_dir', 'reference_cache_dir', 'reference_cache_max_bytes',
+                   'learned_location_mapping_file', 'unmatched_locations_report_file',
+                   'demographics_duplicates_report_file']
+    reference_files = [config[key] for key in ['dropped_columns_file', 'column_name_mapping_file', 'column_dtypes_file',
+                                               'student_demographics_file', 'location_mapping_file'] if key in config]
+    return incremental.settings_hash(config, ignored_keys, reference_files)
+
+
+def read_raw_response_data(config: dict) -> pd.DataFrame:
+    columns_to_drop = read_dropped_columns(config)
+    column_dtypes = read_column_dtypes(config)
+    max_unique_ratio = category_max_unique_ratio(config)
+    arrow_strings = uses_arrow_strings(config)
+    with ThreadPoolExecutor(max_workers=config.get('ingest_workers')) as executor:
+        dfs = list(executor.map(lambda source: read_source_file(*source, columns_to_drop, column_dtypes, max_unique_ratio, arrow_strings),
+                                list_source_files(config)))
+    return pd.concat(unify_categories(dfs), ignore_index=True, sort=True)
+
+
+def read_raw_response_data_in_chunks(config: dict, chunk_size: int) -> Iterator[pd.DataFrame]:
+    columns_to_drop = read_dropped_columns(config)
+    column_dtypes = read_column_dtypes(config)
+    max_unique_ratio = category_max_unique_ratio(config)
+    arrow_strings = uses_arrow_strings(config)
+    sources = list_source_files(config)
+    # every chunk gets the same (sorted) columns that pd.concat(sort=True) would produce for the full set
+    columns = set().union(*(pd.read_csv(f, nrows=0, usecols=lambda col: col not in columns_to_drop).columns for f, _ in sources))
+    columns = sorted(columns | {'education_level'})
+    for filepath, education_level in sources:
+        reader = pd.read_csv(filepath, usecols=lambda col: col not in columns_to_drop, dtype=column_dtypes, chunksize=chunk_size)
+        for chunk in reader:
+            chunk['education_level'] = education_level
+            chunk = chunk.reindex(columns=columns).reset_index(drop=True)
+            # a column that is blank throughout a chunk is inferred as float64, which breaks the string
+            # operations and merges that work on it in every other chunk
+            blank_columns = [col for col in chunk.columns
+                             if col not in column_dtypes and chunk[col].dtype == 'float64' and chunk[col].isna().all()]
+            chunk[blank_columns] = chunk[blank_columns].astype(object)
+            if max_unique_ratio is not None:
+                chunk = dm.categorize_low_cardinality_columns(chunk, max_unique_ratio)
+            yield dm.convert_text_columns_to_arrow(chunk) if arrow_strings else chunk
+
+
+def list_source_files(config: dict) -> List[Tuple[str, str]]:
+    return [(f, 'Undergraduate') for f in config['source_files']['undergraduate']] + \
+           [(f, 'Masters') for f in config['source_files']['masters']]
+
+
+def read_dropped_columns(config: dict) -> frozenset:
+    return frozenset(load_reference_frame(config, 'dropped_columns_file', 'dropped_columns', read_dropped_columns_file)['column'])
+
+
+def read_dropped_columns_file(filepath: str) -> pd.DataFrame:
+    return pd.DataFrame({'column': single_column_to_list(filepath, skip_header=False)}, dtype=object)
+
 
+def read_column_name_map(config: dict) -> dict:
+    column_name_map = load_reference_frame(config, 'column_name_mapping_file', 'column_name_map', read_column_name_mapping_file)
+    return dict(zip(column_name_map['raw'], column_name_map['clean']))
 
-def read_raw_response_data() -> pd.DataFrame:
-    ugrad_df = pd.concat([pd.read_csv(f) for f in CONFIG['source_files']['undergraduate']], ignore_index=True)
-    ugrad_df['education_level'] = 'Undergraduate'
-    grad_df = pd.concat([pd.read_csv(f) for f in CONFIG['source_files']['masters']], ignore_index=True)
-    grad_df['education_level'] = 'Masters'
-    return pd.concat([ugrad_df, grad_df], sort=True)
 
+def read_column_name_mapping_file(filepath: str) -> pd.DataFrame:
+    return pd.DataFrame(list(csv_to_dict(filepath).items()), columns=['raw', 'clean'], dtype=object)
 
-def drop_unnecessary_columns(df: pd.DataFrame) -> pd.DataFrame:
-    columns_to_drop = single_column_to_list(CONFIG['dropped_columns_file'], skip_header=False)
-    return df.drop(columns=columns_to_drop)
 
+def load_reference_frame(config: dict, key: str, name: str, loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+    stat = os.stat(config[key])
+    return _load_reference_frame(config[key], (stat.st_mtime_ns, stat.st_size), name, loader,
+                                 config.get('reference_cache_dir'), config.get('reference_cache_max_bytes'))
 
-def rename_columns(df: pd.DataFrame) -> pd.DataFrame:
-    column_name_map = csv_to_dict(CONFIG['column_name_mapping_file'])
+
+@lru_cache(maxsize=32)
+def _load_reference_frame(filepath: str, file_version: Tuple[int, int], name: str, loader: Callable[[str], pd.DataFrame],
+                          cache_dir: Optional[str], cache_max_bytes: Optional[int]) -> pd.DataFrame:
+    # cached per process by path and modification time, so a batch worker parses each reference file once however
+    # many years it cleans, but a file that changes while the process runs is read again
+    if cache_dir is None:
+        return loader(filepath)
+    return ReferenceCache(cache_dir, cache_max_bytes).load_frame(filepath, name, loader)
+
+
+def read_column_dtypes(config: dict) -> dict:
+    if 'column_dtypes_file' not in config:
+        return {}
+    return csv_to_dict(config['column_dtypes_file'])
+
+
+def category_max_unique_ratio(config: dict) -> Optional[float]:
+    return config.get('category_max_unique_ratio', 0.5) if config.get('low_memory') else None
+
+
+def uses_arrow_strings(config: dict) -> bool:
+    backend = config.get('backend', 'pandas')
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend "{backend}"; expected one of {BACKENDS}')
+    return backend == 'arrow'
+
+
+def read_source_file(filepath: str, education_level: str, columns_to_drop: frozenset, column_dtypes: dict,
+                     category_max_unique_ratio: float = None, arrow_strings: bool = False) -> pd.DataFrame:
+    df = pd.read_csv(filepath, usecols=lambda col: col not in columns_to_drop, dtype=column_dtypes)
+    if category_max_unique_ratio is None:
+        df['education_level'] = education_level
+    else:
+        df['education_level'] = dm.constant_column(education_level, len(df))
+        df = dm.categorize_low_cardinality_columns(df, category_max_unique_ratio)
+    # the text columns that are left are stored as Arrow strings, which every data_manipulation function accepts
+    return dm.convert_text_columns_to_arrow(df) if arrow_strings else df
+
+
+def unify_categories(dfs: list) -> list:
+    # concat silently falls back to object dtype unless every frame shares the same categories
+    categorical_columns = {col for df in dfs for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    for col in categorical_columns:
+        categoricals = [df[col].astype('category') for df in dfs if col in df.columns]
+        categories = union_categoricals(categoricals, ignore_order=True).categories
+        for df in dfs:
+            if col in df.columns:
+                df[col] = df[col].astype('category').cat.set_categories(categories)
+    return dfs
+
+
+def rename_columns(df: pd.DataFrame, column_name_map: dict) -> pd.DataFrame:
     return df.rename(columns=column_name_map)
 
 
-def add_student_demographic_data(df: pd.DataFrame) -> pd.DataFrame:
-    demographics = pd.read_excel(CONFIG["student_demographics_file"])
+def add_student_demographic_data(df: pd.DataFrame, lookup: DimensionLookup) -> pd.DataFrame:
+    return lookup.attach(df, 'hopkins_id')
+
+
+def student_demographics_lookup(config: dict) -> DimensionLookup:
+    lookup = DimensionLookup(read_student_demographic_data(config), 'hopkins_id', config.get('demographic_columns'),
+                             on_duplicate=config.get('demographics_on_duplicate', 'first'))
+    duplicates = lookup.duplicate_report()
+    if not duplicates.empty:
+        print(f'{len(duplicates)} hopkins_ids appear more than once in the student demographics; using the first row of each')
+    if 'demographics_duplicates_report_file' in config:
+        duplicates.to_csv(config['demographics_duplicates_report_file'], index=False)
+    return lookup
+
+
+def read_student_demographic_data(config: dict) -> pd.DataFrame:
+    return load_reference_frame(config, 'student_demographics_file', 'student_demographics', read_student_demographics_file)
+
+
+def read_student_demographics_file(filepath: str) -> pd.DataFrame:
+    demographics = pd.read_excel(filepath)
     demographics['hopkins_id'] = demographics['hopkins_id'].str.lower()
-    return df.merge(demographics, how='left', on='hopkins_id')
+    return demographics
+
 
+def split_locations_into_city_state_country(df: pd.DataFrame, resolver: LocationResolver, low_memory: bool = False) -> pd.DataFrame:
+    locations = resolver.resolve(df['location'])
+    if low_memory:
+        for col in locations.columns:
+            df[col] = locations[col].astype('category')
+        return df
+    return pd.concat([df.drop(columns=['location']), locations], axis=1)
 
-def split_locations_into_city_state_country(df: pd.DataFrame) -> pd.DataFrame:
-    locations = pd.read_excel(CONFIG["location_mapping_file"])
-    return df.merge(locations, how='left', left_on='location', right_on='raw_location').drop(columns=['location', 'raw_location'])
 
+def location_resolver(config: dict) -> LocationResolver:
+    learned = read_learned_mapping(config.get('learned_location_mapping_file'))
+    return LocationResolver(read_location_mapping(config), learned, config.get('location_fuzzy_cutoff'))
 
-def add_cont_ed_major_supplemental_info(df: pd.DataFrame) -> pd.DataFrame:
-    df['cont_ed_major_group'] = ''
-    df['cont_ed_degree'] = ''
+
+def save_location_resolutions(config: dict, resolver: LocationResolver):
+    if 'learned_location_mapping_file' in config:
+        resolver.learned_mapping().to_csv(config['learned_location_mapping_file'], index=False)
+    if 'unmatched_locations_report_file' in config:
+        resolver.unmatched_report().to_csv(config['unmatched_locations_report_file'], index=False)
+
+
+def read_location_mapping(config: dict) -> pd.DataFrame:
+    return load_reference_frame(config, 'location_mapping_file', 'location_mapping', pd.read_excel)
+
+
+def add_cont_ed_major_supplemental_info(df: pd.DataFrame, low_memory: bool = False) -> pd.DataFrame:
+    df['cont_ed_major_group'] = dm.constant_column('', len(df)) if low_memory else ''
+    df['cont_ed_degree'] = dm.constant_column('', len(df)) if low_memory else ''
     return df
 
 
-def add_fds_year(df: pd.DataFrame) -> pd.DataFrame:
-    df['fds_year'] = CONFIG['fds_year']
+def add_fds_year(df: pd.DataFrame, fds_year: str, low_memory: bool = False) -> pd.DataFrame:
+    df['fds_year'] = dm.constant_column(fds_year, len(df)) if low_memory else fds_year
     return df
 
 
-def drop_columns_needed_for_cleaning_but_not_for_analysis(df: pd.DataFrame) -> pd.DataFrame:
-    return df.drop(columns=['pay_schedule'])
+def recode_response_status_as_is_submitted(df: pd.DataFrame, low_memory: bool = False) -> pd.DataFrame:
+    return dm.recode_response_status_as_is_submitted(df, drop=not low_memory)
+
+
+def add_consolidated_ldl_nps_columns(df: pd.DataFrame, low_memory: bool = False) -> pd.DataFrame:
+    return dm.add_consolidated_ldl_nps_columns(df, drop=not low_memory)
+
+
+def drop_columns_needed_for_cleaning_but_not_for_analysis(df: pd.DataFrame, deferred_columns: List[str] = ()) -> pd.DataFrame:
+    return df.drop(columns=['pay_schedule'] + list(deferred_columns))
+
+
+def summary_cube(config: dict, columns: pd.Index) -> SummaryCube:
+    default_dimensions = SUMMARY_DIMENSIONS + [col for col in DEMOGRAPHIC_FLAG_COLUMNS if col in columns]
+    return SummaryCube(config.get('summary_dimensions', default_dimensions), config.get('summary_max_dimensions', SUMMARY_MAX_DIMENSIONS))
+
+
+def convert_demographic_flags_to_booleans(df: pd.DataFrame) -> pd.DataFrame:
+    # only the demographic columns that were selected are present
+    columns = [col for col in DEMOGRAPHIC_FLAG_COLUMNS if col in df.columns]
+    return dm.convert_flag_columns_to_booleans(df, columns)
+
+
+def output_column_formats(config: dict) -> List[dict]:
+    return validate_column_formats(config.get('column_formats', DEFAULT_COLUMN_FORMATS))
+
+
+def apply_outcome_recodes(df: pd.DataFrame, rules: RecodeRules, low_memory: bool = False) -> pd.DataFrame:
+    return rules.apply(df, drop=not low_memory)
+
+
+def outcome_recode_rules(config: dict) -> RecodeRules:
+    return RecodeRules(config.get('outcome_recode_rules', dm.OUTCOME_RECODE_RULES))
 
 
-def recode_boolean_columns_to_excel_friendly_strings(df: pd.DataFrame) -> pd.DataFrame:
-    columns = ['is_athlete', 'is_first_gen', 'is_pell_eligible', 'is_urm']
-    return dm.recode_boolean_columns_to_excel_friendly_strings(df, columns)
+def add_is_jhu_column(df: pd.DataFrame, jhu_patterns: List[str] = None) -> pd.DataFrame:
+    return dm.add_is_jhu_column(df, jhu_patterns)
 
 
 def expand_activities_at_jhu_into_multiple_columns(df: pd.DataFrame) -> pd.DataFrame:
@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import time
+import tracemalloc
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+Stage = Tuple[str, Callable[[pd.DataFrame], pd.DataFrame]]
+
+PROFILE_FIELDS = [
+    'stage', 'calls', 'wall_seconds', 'cpu_seconds', 'peak_traced_mb', 'max_rss_mb',
+    'memory_before_mb', 'memory_after_mb', 'rows_before', 'rows_after', 'columns_before', 'columns_after',
+]
+
+
+class Pipeline:
+    """Runs named DataFrame stages in order, optionally profiling and checkpointing each one.
+
+    A run can start at a named stage, either with the given frame or, if none is given, from the
+    checkpoint written after the stage before it, and can stop after a named stage. When the same stage
+    runs more than once (e.g. once per chunk), its profile entry accumulates times, row counts and
+    memory, and keeps the highest peaks.
+    """
+
+    def __init__(self, stages: List[Stage], profile: bool = False, checkpoint_dir: str = None):
+        self.stages = stages
+        self.stage_names = [name for name, _ in stages]
+        self.profile = profile
+        self.checkpoint_dir = checkpoint_dir
+        self.stopped = False
+        self._profile = {}
+
+    def run(self, df: Optional[pd.DataFrame], start: str = None, stop: str = None, checkpoint: bool = True) -> pd.DataFrame:
+        start_index = self._stage_index(start) if start else 0
+        stop_index = self._stage_index(stop) if stop else len(self.stages) - 1
+        if df is None and start_index > 0:
+            df = self.load_checkpoint(self.stage_names[start_index - 1])
+        for name, func in self.stages[start_index:stop_index + 1]:
+            df = self.run_stage(name, func, df)
+            if checkpoint and self.checkpoint_dir:
+                self.save_checkpoint(name, df)
+        self.stopped = stop_index < len(self.stages) - 1
+        return df
+
+    def run_stage(self, name: str, func: Callable, df: Optional[pd.DataFrame]):
+        if not self.profile:
+            return func(df)
+        memory_before = _frame_memory(df)
+        shape_before = df.shape if isinstance(df, pd.DataFrame) else (0, 0)
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        result = func(df)
+        wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+        peak_traced = tracemalloc.get_traced_memory()[1] - traced_before
+        if not tracing:
+            tracemalloc.stop()
+        shape_after = result.shape if isinstance(result, pd.DataFrame) else shape_before
+        self._record(name, {
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'peak_traced_mb': peak_traced / 2 ** 20,
+            'max_rss_mb': _max_rss_mb(),
+            'memory_before_mb': memory_before,
+            'memory_after_mb': _frame_memory(result),
+            'rows_before': shape_before[0],
+            'rows_after': shape_after[0],
+            'columns_before': shape_before[1],
+            'columns_after': shape_after[1],
+        })
+        return result
+
+    def profile_report(self) -> List[dict]:
+        return list(self._profile.values())
+
+    def write_profile_report(self, filepath: str):
+        report = self.profile_report()
+        if filepath.lower().endswith('.json'):
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        else:
+            with open(filepath, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=PROFILE_FIELDS)
+                writer.writeheader()
+                writer.writerows(report)
+
+    def save_checkpoint(self, name: str, df: pd.DataFrame):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        df.to_pickle(self._checkpoint_path(name))
+
+    def load_checkpoint(self, name: str) -> pd.DataFrame:
+        if not self.checkpoint_dir or not os.path.exists(self._checkpoint_path(name)):
+            raise ValueError(f'No checkpoint for stage "{name}"; run the pipeline through it with a checkpoint_dir first')
+        return pd.read_pickle(self._checkpoint_path(name))
+
+    def _checkpoint_path(self, name: str) -> str:
+        return os.path.join(self.checkpoint_dir, f'{name}.pkl')
+
+    def _stage_index(self, name: str) -> int:
+        if name not in self.stage_names:
+            raise ValueError(f'Unknown stage "{name}"; expected one of {self.stage_names}')
+        return self.stage_names.index(name)
+
+    def _record(self, name: str, measurements: dict):
+        if name not in self._profile:
+            self._profile[name] = dict({'stage': name, 'calls': 1}, **measurements)
+            return
+        entry = self._profile[name]
+        entry['calls'] += 1
+        for field, value in measurements.items():
+            if field in ('peak_traced_mb', 'max_rss_mb'):
+                entry[field] = max(entry[field], value) if value is not None else entry[field]
+            else:
+                entry[field] += value
+
+
+def _frame_memory(df) -> float:
+    if not isinstance(df, pd.DataFrame):
+        return 0.0
+    return df.memory_usage(deep=True).sum() / 2 ** 20
+
+
+def _max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is the process high-water mark, reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
@@ -0,0 +1,78 @@
+import os
+from typing import Dict, List
+
+import pandas as pd
+
+REPORT_COLUMNS = ['severity', 'file', 'column', 'problem']
+
+
+class SchemaPreflight:
+    """Checks the header rows of the input files against what the cleaning stages expect.
+
+    Only headers are read, so every mismatch is found before any response, demographic or location row is
+    loaded. Problems are collected rather than raised one at a time: errors would make a run fail or
+    produce wrong output, warnings are likely mistakes that do not stop a run.
+    """
+
+    def __init__(self):
+        self._problems = []
+
+    def error(self, file: str, column: str, problem: str):
+        self._problems.append(('error', file, column, problem))
+
+    def warning(self, file: str, column: str, problem: str):
+        self._problems.append(('warning', file, column, problem))
+
+    def check_source_headers(self, headers: Dict[str, List[str]], columns_to_drop: frozenset, column_name_map: dict,
+                             required_columns: Dict[str, List[str]], column_dtypes: dict = None):
+        """Checks the responses' CSV headers once the dropped columns are removed and the rest renamed.
+
+        headers maps every source file to the columns it provides; required_columns maps every stage to the
+        cleaned columns it reads.
+        """
+        all_columns = set().union(*headers.values()) if headers else set()
+        for col in sorted(columns_to_drop - all_columns):
+            self.warning('dropped_columns_file', col, 'is not in any source file; if it was renamed, the new column is kept')
+        for raw in sorted(set(column_name_map) - all_columns):
+            self.warning('column_name_mapping_file', raw, f'is not in any source file, so no column is renamed to "{column_name_map[raw]}"')
+        for col in sorted(set(column_dtypes or {}) - all_columns):
+            self.warning('column_dtypes_file', col, 'is not in any source file')
+        # pd.concat fills a column that only some files have with missing values for the others,
+        # so a required column only has to be in one of them
+        all_renamed = {column_name_map.get(col, col) for col in all_columns - columns_to_drop}
+        for stage, columns in required_columns.items():
+            for col in columns:
+                if col not in all_renamed:
+                    self.error('source_files', col, f'is required by {stage} but missing from every source file after dropping and renaming columns')
+        for filepath, header in headers.items():
+            kept = [col for col in header if col not in columns_to_drop]
+            renamed = [column_name_map.get(col, col) for col in kept]
+            for clean in sorted({col for col in renamed if renamed.count(col) > 1}):
+                sources = [raw for raw in kept if column_name_map.get(raw, raw) == clean]
+                self.error(filepath, clean, f'is the name of more than one column after renaming: {sources}')
+            for col in sorted(all_columns - set(header) - columns_to_drop):
+                self.warning(filepath, col, 'is in other source files but not in this one')
+
+    def check_reference_header(self, name: str, header: List[str], required_columns: List[str]):
+        for col in required_columns:
+            if col not in header:
+                self.error(name, col, 'is a required column but missing from the header')
+
+    def check_files_exist(self, filepaths: Dict[str, str]) -> bool:
+        missing = {name: path for name, path in filepaths.items() if not os.path.exists(path)}
+        for name, path in missing.items():
+            self.error(name, '', f'{path} does not exist')
+        return not missing
+
+    def report(self) -> pd.DataFrame:
+        return pd.DataFrame(self._problems, columns=REPORT_COLUMNS)
+
+    def has_errors(self) -> bool:
+        return any(severity == 'error' for severity, *_ in self._problems)
+
+
+def read_header(filepath: str) -> List[str]:
+    """Reads only the header row of a CSV or Excel file."""
+    if os.path.splitext(filepath)[1].lower() in ['.xlsx', '.xlsm', '.xls']:
+        return [str(col) for col in pd.read_excel(filepath, nrows=0).columns]
+    return list(pd.read_csv(filepath, nrows=0).columns)
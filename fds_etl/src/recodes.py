@@ -0,0 +1,190 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas.api.types import is_categorical_dtype
+
+CONDITION_KEYS = ['column', 'equals', 'in', 'not_blank', 'all', 'any']
+
+
+class RecodeRules:
+    """Applies an ordered table of recode rules to a frame in one pass.
+
+    Each rule is a dict with a `when` condition, a `set` mapping of columns to values and an optional list
+    of columns to `drop`. A condition is `{"column": c, "equals": v}`, `{"column": c, "in": [...]}`,
+    `{"column": c, "not_blank": true}`, or `{"all": [...]}` / `{"any": [...]}` of other conditions. A value
+    is a literal, `{"column": c}`, or `{"concat": [...]}` of values.
+
+    Rules behave as if they were applied one after another: later rules overwrite earlier ones and see
+    the values they assigned. Instead of writing to the frame after every rule, each column the rules
+    read or write is factorized once, conditions are evaluated once per distinct value and assignments
+    only update codes. Every changed column is written back once at the end and all dropped columns
+    are removed with a single drop. required_columns lists the columns the rules read or drop without
+    assigning them first, which must exist before the rules are applied.
+    """
+
+    def __init__(self, rules: List[dict]):
+        for rule in rules:
+            _validate_rule(rule)
+        self.rules = rules
+        self.dropped_columns = list(dict.fromkeys(name for rule in rules for name in rule.get('drop', [])))
+        assigned_columns = {name for rule in rules for name in rule['set']}
+        read_columns = [name for rule in rules for name in _condition_columns(rule['when']) + _value_columns(list(rule['set'].values()))]
+        # columns that are only assigned or dropped after being assigned need not exist beforehand
+        self.required_columns = list(dict.fromkeys(read_columns + [name for name in self.dropped_columns if name not in assigned_columns]))
+
+    def apply(self, df: pd.DataFrame, drop: bool = True) -> pd.DataFrame:
+        columns = {}
+        changed = {}
+
+        def column(name: str) -> _FactorizedColumn:
+            if name not in columns:
+                columns[name] = _FactorizedColumn(df[name] if name in df.columns else pd.Series(np.nan, index=df.index))
+            return columns[name]
+
+        for rule in self.rules:
+            mask = _evaluate_condition(rule['when'], column)
+            if not mask.any():
+                continue
+            # all values are computed before any is assigned, as with a multi-column .loc write
+            values = {name: _evaluate_value(value, column, mask) for name, value in rule['set'].items()}
+            for name, value in values.items():
+                column(name).assign(mask, value)
+                changed[name] = changed.get(name, np.zeros(len(df), dtype=bool)) | mask
+        for name in dict.fromkeys(name for rule in self.rules for name in rule['set']):
+            if name in changed:
+                _write_rows(df, name, changed[name], columns[name].take(changed[name]))
+            elif name not in df.columns:
+                # a rule creates the columns it assigns even when it matches no row, as a .loc write would
+                df[name] = pd.Series(np.nan, index=df.index, dtype=object)
+        return df.drop(columns=self.dropped_columns) if drop else df
+
+
+class _FactorizedColumn:
+    """A column's current values as codes into a table of distinct values.
+
+    Code -1 marks a row that still holds its original value. The original column is only factorized once
+    a condition reads it, so columns that are merely assigned or copied are never hashed.
+    """
+
+    def __init__(self, series: pd.Series):
+        self.series = series
+        self.codes = np.full(len(series), -1, dtype=np.int64)
+        self.values = np.empty(0, dtype=object)
+
+    def matches(self, predicate) -> np.ndarray:
+        if (self.codes == -1).any():
+            self._factorize_original_values()
+        return predicate(pd.Series(self.values, dtype=object)).fillna(False).to_numpy(dtype=bool)[self.codes]
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        codes = self.codes[rows]
+        # Arrow-backed strings hand out pd.NA for missing values; keep them NaN like object columns
+        taken = self.series[rows].to_numpy(dtype=object, na_value=np.nan) if isinstance(self.series.dtype, pd.StringDtype) \
+            else self.series[rows].to_numpy(dtype=object)
+        assigned = codes >= 0
+        taken[assigned] = self.values[codes[assigned]]
+        return taken
+
+    def assign(self, rows: np.ndarray, value):
+        if isinstance(value, np.ndarray):
+            self.codes[rows] = len(self.values) + np.arange(len(value))
+            self.values = np.concatenate([self.values, value.astype(object)])
+        else:
+            self.codes[rows] = len(self.values)
+            self.values = np.append(self.values, np.array([value], dtype=object))
+
+    def _factorize_original_values(self):
+        original = self.codes == -1
+        codes, uniques = pd.factorize(self.series if original.all() else self.series[original])
+        uniques = np.asarray(uniques, dtype=object)
+        missing_code = len(self.values) + len(uniques)
+        self.codes[original] = np.where(codes >= 0, codes + len(self.values), missing_code)
+        self.values = np.concatenate([self.values, uniques, np.array([np.nan], dtype=object)])
+
+
+def _write_rows(df: pd.DataFrame, name: str, rows: np.ndarray, values: np.ndarray):
+    values = pd.Series(values, dtype=object).infer_objects()
+    if name not in df.columns:
+        df[name] = np.nan
+    elif is_categorical_dtype(df[name]):
+        new_categories = values.dropna().unique()
+        df[name] = df[name].cat.add_categories(new_categories[~np.isin(new_categories, df[name].cat.categories)])
+    elif isinstance(df[name].dtype, pd.StringDtype):
+        if pd.api.types.infer_dtype(values, skipna=True) in ['string', 'empty']:
+            # replace the rows inside the Arrow array instead of round-tripping the column through Python strings
+            replacements = pa.array(values.to_numpy(), type=pa.string(), from_pandas=True)
+            df[name] = pd.arrays.ArrowStringArray(pc.replace_with_mask(pa.array(df[name].array), pa.array(rows), replacements))
+            return
+        # a string column only holds text, so a rule that writes other values turns it back into an object column
+        df[name] = df[name].to_numpy(dtype=object, na_value=np.nan)
+    column = df[name].copy()
+    if not is_categorical_dtype(column) and column.dtype != values.dtype:
+        # upcast here rather than leave it to the write, and then narrow to what the column now holds
+        column = column.astype(object)
+        column[rows] = values.to_numpy()
+        column = column.infer_objects()
+    else:
+        column[rows] = values.to_numpy()
+    # the column is replaced rather than written into with .loc, which pandas will stop letting change a column's dtype
+    df[name] = column
+
+
+def _evaluate_condition(condition: dict, column) -> np.ndarray:
+    if 'all' in condition:
+        return np.logical_and.reduce([_evaluate_condition(c, column) for c in condition['all']])
+    if 'any' in condition:
+        return np.logical_or.reduce([_evaluate_condition(c, column) for c in condition['any']])
+    if 'equals' in condition:
+        return column(condition['column']).matches(lambda values: values == condition['equals'])
+    if 'in' in condition:
+        # as an object array the listed values need no common dtype with the column's
+        return column(condition['column']).matches(lambda values: values.isin(np.array(condition['in'], dtype=object)))
+    return column(condition['column']).matches(lambda values: values.notna() & (values != ''))
+
+
+def _evaluate_value(value, column, mask: np.ndarray):
+    if isinstance(value, dict) and 'column' in value:
+        return column(value['column']).take(mask)
+    if isinstance(value, dict) and 'concat' in value:
+        # pandas propagates missing values through string concatenation, as the original recodes did
+        parts = [pd.Series(_evaluate_value(part, column, mask)) if isinstance(part, dict) else part for part in value['concat']]
+        result = parts[0]
+        for part in parts[1:]:
+            result = result + part
+        return result.to_numpy(dtype=object) if isinstance(result, pd.Series) else np.full(mask.sum(), result, dtype=object)
+    return value
+
+
+def _condition_columns(condition: dict) -> List[str]:
+    if 'all' in condition or 'any' in condition:
+        return [name for nested in condition.get('all', []) + condition.get('any', []) for name in _condition_columns(nested)]
+    return [condition['column']]
+
+
+def _value_columns(values: list) -> List[str]:
+    columns = []
+    for value in values:
+        if isinstance(value, dict) and 'column' in value:
+            columns.append(value['column'])
+        elif isinstance(value, dict) and 'concat' in value:
+            columns.extend(_value_columns(value['concat']))
+    return columns
+
+
+def _validate_rule(rule: dict):
+    if not isinstance(rule.get('when'), dict) or not isinstance(rule.get('set'), dict):
+        raise ValueError(f'Recode rule {rule.get("name", rule)} needs a "when" condition and a "set" mapping')
+    _validate_condition(rule['when'])
+
+
+def _validate_condition(condition: dict):
+    if not isinstance(condition, dict) or not set(condition) <= set(CONDITION_KEYS):
+        raise ValueError(f'Invalid recode condition {condition}; expected keys among {CONDITION_KEYS}')
+    for key in ['all', 'any']:
+        for nested in condition.get(key, []):
+            _validate_condition(nested)
+    if not ({'all', 'any'} & set(condition)) and not ('column' in condition and {'equals', 'in', 'not_blank'} & set(condition)):
+        raise ValueError(f'Invalid recode condition {condition}; a column condition needs "equals", "in" or "not_blank"')
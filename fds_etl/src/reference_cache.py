@@ -0,0 +1,134 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+ENTRY_SUFFIX = '.entry.json'
+
+
+class ReferenceCache:
+    """Stores parsed and normalized reference inputs as Parquet so later runs can skip re-parsing them.
+
+    Entries are keyed by source path and loader name. An entry is reused while the source file's mtime
+    and size are unchanged; if those change but the content hash does not, the entry is still reused.
+    When the cache grows beyond max_bytes, the least recently used entries other than the one just
+    stored are evicted.
+
+    Every entry keeps its metadata in its own small JSON file instead of a shared index, so processes
+    sharing a cache directory (e.g. batch workers) never overwrite each other's updates. Files are
+    written under a temporary name and renamed into place, and an entry whose Parquet file another
+    process evicts before it can be read is loaded again from its source.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def load_frame(self, filepath: str, name: str, loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        key = f'{os.path.abspath(filepath)}::{name}'
+        entry_path = os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + ENTRY_SUFFIX)
+        entry = _read_json(entry_path)
+        stat = os.stat(filepath)
+        if entry is not None and not (entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size):
+            if entry['content_hash'] == file_content_hash(filepath):
+                entry.update(mtime=stat.st_mtime, size=stat.st_size)
+            else:
+                self._remove_entry(entry_path, entry)
+                entry = None
+        if entry is not None:
+            df = self._read_frame(entry)
+            if df is not None:
+                entry['last_used'] = time.time()
+                self._write_file(entry_path, lambda path: _write_json(path, entry))
+                return df
+        df = loader(filepath)
+        content_hash = file_content_hash(filepath)
+        entry = {
+            'file': hashlib.sha256(f'{key}::{content_hash}'.encode('utf-8')).hexdigest() + '.parquet',
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'content_hash': content_hash,
+            'last_used': time.time(),
+        }
+        try:
+            self._write_file(self._frame_path(entry), lambda path: df.to_parquet(path, index=False))
+        except pa.ArrowException as error:
+            # e.g. an Excel column mixing numbers and text, which Parquet cannot store as one column
+            print(f'Not caching {name} from {filepath}: {error}')
+            return df
+        entry['bytes'] = os.path.getsize(self._frame_path(entry))
+        self._write_file(entry_path, lambda path: _write_json(path, entry))
+        self._evict(keep=entry_path)
+        # read the entry back so a miss returns exactly what a later hit will
+        cached_df = self._read_frame(entry)
+        return cached_df if cached_df is not None else df
+
+    def _read_frame(self, entry: dict) -> Optional[pd.DataFrame]:
+        try:
+            return pd.read_parquet(self._frame_path(entry))
+        except FileNotFoundError:
+            return None
+
+    def _evict(self, keep: str):
+        if self.max_bytes is None:
+            return
+        entries = [(entry_path, _read_json(entry_path)) for entry_path in glob.glob(os.path.join(self.cache_dir, '*' + ENTRY_SUFFIX))]
+        entries = [(entry_path, entry) for entry_path, entry in entries if entry is not None]
+        total_bytes = sum(entry['bytes'] for _, entry in entries)
+        for entry_path, entry in sorted(entries, key=lambda item: item[1]['last_used']):
+            if total_bytes <= self.max_bytes:
+                break
+            if entry_path == keep:
+                continue
+            total_bytes -= entry['bytes']
+            self._remove_entry(entry_path, entry)
+
+    def _remove_entry(self, entry_path: str, entry: dict):
+        for path in [entry_path, self._frame_path(entry)]:
+            try:
+                os.remove(path)
+            except OSError:
+                # already removed by another process, or still open in one on platforms that forbid removing it
+                pass
+
+    def _frame_path(self, entry: dict) -> str:
+        return os.path.join(self.cache_dir, entry['file'])
+
+    def _write_file(self, path: str, write: Callable[[str], None]):
+        # write then rename so a reader never sees a half-written file
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            write(temp_path)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json(path: str, value: dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(value, f, indent=2)
+
+
+def file_content_hash(filepath: str) -> str:
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
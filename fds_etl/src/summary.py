@@ -0,0 +1,107 @@
+from itertools import combinations
+from typing import List
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype
+
+import fds_etl.src.data_manipulation as dm
+
+GROUPED_BY_COLUMN = 'grouped_by'
+OUTCOME_PREFIX = 'outcome: '
+MEASURE_AGGREGATIONS = {'nps_sum': 'sum', 'min_ldl_nps': 'min', 'max_ldl_nps': 'max'}
+
+
+class SummaryCube:
+    """Aggregates cleaned responses into outcome summaries for every combination of dimensions.
+
+    Rows are first folded, in a single grouped pass, into cells at the finest grain: one per distinct
+    combination of all dimensions, holding counts, the NPS sum and the NPS min/max. Cells from separate
+    chunks or runs merge by re-aggregating them, and a cell only has to be recomputed when one of its rows
+    changes. Every grouping set (each combination of up to max_grouped_dimensions dimensions) is then rolled
+    up from the smallest grouping set already computed that contains it rather than from the rows.
+
+    Counts are over longform rows, so a response with several majors counts once per major.
+    """
+
+    def __init__(self, dimensions: List[str], max_grouped_dimensions: int = None):
+        self.dimensions = list(dimensions)
+        max_grouped_dimensions = len(self.dimensions) if max_grouped_dimensions is None else max_grouped_dimensions
+        self.grouping_sets = [grouped for size in range(min(max_grouped_dimensions, len(self.dimensions)) + 1)
+                              for grouped in combinations(self.dimensions, size)]
+
+    def aggregate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Folds response rows into cells."""
+        missing_columns = [col for col in self.dimensions if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f'Summary dimensions {missing_columns} are not columns of the cleaned responses')
+        avg_nps = df['avg_ldl_nps'].to_numpy(dtype=float, na_value=np.nan)
+        rows = pd.DataFrame({
+            'responses': np.ones(len(df), dtype=np.int64),
+            'submitted': df['is_submitted'].to_numpy(dtype=np.int64, na_value=0),
+            'known_outcomes': df['outcome'].notna().to_numpy(dtype=np.int64),
+            'nps_responses': (~np.isnan(avg_nps)).astype(np.int64),
+            'nps_sum': np.nan_to_num(avg_nps),
+            'min_ldl_nps': df['min_ldl_nps'].to_numpy(dtype=float, na_value=np.nan),
+            'max_ldl_nps': df['max_ldl_nps'].to_numpy(dtype=float, na_value=np.nan),
+        }, index=df.index)
+        outcomes = pd.get_dummies(df['outcome'].astype(object), prefix=OUTCOME_PREFIX, prefix_sep='', dtype=np.int64)
+        rows = pd.concat([df[self.dimensions], rows, outcomes], axis=1)
+        return self._reaggregate(rows, self.dimensions)
+
+    def merge(self, cells: List[pd.DataFrame]) -> pd.DataFrame:
+        """Combines cells aggregated from disjoint sets of rows."""
+        return self._reaggregate(_concat_cells(cells), self.dimensions)
+
+    def update(self, cells: pd.DataFrame, df: pd.DataFrame, changed_rows: List[pd.DataFrame]) -> pd.DataFrame:
+        """Recomputes only the cells that any of the changed rows (old or new versions) belong to.
+
+        df holds every current row; the other cells are kept as they are.
+        """
+        affected = np.concatenate([dm.hash_rows(rows[self.dimensions]) for rows in changed_rows if not rows.empty] or [[]])
+        if not len(affected):
+            return cells
+        kept_cells = cells[~np.isin(dm.hash_rows(cells[self.dimensions]), affected)]
+        affected_rows = df[np.isin(dm.hash_rows(df[self.dimensions]), affected)]
+        return _concat_cells([kept_cells, self.aggregate(affected_rows)])
+
+    def rollup(self, cells: pd.DataFrame) -> pd.DataFrame:
+        """Returns one summary row per group of every grouping set, with the dimensions it is not grouped by left blank."""
+        tables = {tuple(self.dimensions): cells}
+        for grouped in sorted(self.grouping_sets, key=len, reverse=True):
+            if grouped not in tables:
+                parent = min((table for key, table in tables.items() if set(grouped) < set(key)), key=len)
+                tables[grouped] = self._reaggregate(parent, list(grouped))
+        summary = pd.concat([
+            tables[grouped].sort_values(list(grouped), na_position='first', kind='mergesort', key=_sort_key)
+                           .assign(**{GROUPED_BY_COLUMN: ','.join(grouped)})
+            for grouped in self.grouping_sets
+        ], ignore_index=True)
+        return _add_rates(summary.reindex(columns=[GROUPED_BY_COLUMN] + list(cells.columns)))
+
+    def _reaggregate(self, cells: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+        aggregations = {col: MEASURE_AGGREGATIONS.get(col, 'sum') for col in cells.columns if col not in self.dimensions}
+        if not by:
+            return cells.agg(aggregations).to_frame().T.astype(cells[list(aggregations)].dtypes)
+        # categoricals would otherwise get a cell for every unobserved combination of categories
+        return cells.groupby(by, dropna=False, sort=False, observed=True).agg(aggregations).reset_index()
+
+
+def _sort_key(col: pd.Series) -> pd.Series:
+    # categoricals sort by category order, which differs between chunks and runs; sort by value instead
+    return col.astype(object) if is_categorical_dtype(col) else col
+
+
+def _concat_cells(cells: List[pd.DataFrame]) -> pd.DataFrame:
+    combined = pd.concat(cells, ignore_index=True)
+    # an outcome that did not occur in some of the cells is a count of zero there
+    outcome_columns = sorted(col for col in combined.columns if col.startswith(OUTCOME_PREFIX))
+    combined[outcome_columns] = combined[outcome_columns].fillna(0).astype(np.int64)
+    return combined[[col for col in combined.columns if not col.startswith(OUTCOME_PREFIX)] + outcome_columns]
+
+
+def _add_rates(summary: pd.DataFrame) -> pd.DataFrame:
+    summary.insert(summary.columns.get_loc('known_outcomes') + 1, 'knowledge_rate', summary['known_outcomes'] / summary['responses'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        summary.insert(summary.columns.get_loc('nps_sum'), 'avg_ldl_nps', summary['nps_sum'] / summary['nps_responses'].replace(0, np.nan))
+    return summary.drop(columns=['nps_sum'])
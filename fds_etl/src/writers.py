@@ -0,0 +1,228 @@
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+OutputTarget = Union[str, dict]
+
+COLUMN_FORMAT_KEYS = ['columns', 'formats', 'true', 'false', 'missing']
+
+# rows per worksheet, the header included
+XLSX_MAX_ROWS = 1048576
+
+FORMATS_BY_EXTENSION = {
+    '.xlsx': 'xlsx',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+}
+
+
+def group_targets_by_format(targets: List[OutputTarget]) -> Dict[str, List[str]]:
+    """Maps each output format to its destination paths.
+
+    A target is either a path, whose format is inferred from its extension, or a
+    {"path": ..., "format": ...} entry.
+    """
+    paths_by_format = {}
+    for target in targets:
+        if isinstance(target, str):
+            path, output_format = target, None
+        else:
+            path, output_format = target['path'], target.get('format')
+        if output_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            if extension not in FORMATS_BY_EXTENSION:
+                raise ValueError(f'Cannot infer the output format of {path}; give it a "format"')
+            output_format = FORMATS_BY_EXTENSION[extension]
+        if output_format not in CHUNK_WRITERS:
+            raise ValueError(f'Unsupported output format "{output_format}" for {path}')
+        paths_by_format.setdefault(output_format, []).append(path)
+    return paths_by_format
+
+
+def validate_column_formats(column_formats: List[dict]) -> List[dict]:
+    """Checks column format rules.
+
+    A rule renders the booleans and missing values of its `columns` as the strings `true` (default "TRUE"),
+    `false` (default "FALSE") and `missing` (default ""), but only in the output `formats` it lists
+    (default ["xlsx"]). Every other format keeps the columns' own dtypes.
+    """
+    for rule in column_formats:
+        if not isinstance(rule, dict) or 'columns' not in rule or not set(rule) <= set(COLUMN_FORMAT_KEYS):
+            raise ValueError(f'Invalid column format rule {rule}; expected "columns" and keys among {COLUMN_FORMAT_KEYS}')
+        unknown_formats = [output_format for output_format in rule.get('formats', []) if output_format not in CHUNK_WRITERS]
+        if unknown_formats:
+            raise ValueError(f'Unsupported output formats {unknown_formats} in column format rule {rule}')
+    return column_formats
+
+
+def render_columns(df: pd.DataFrame, column_formats: List[dict], output_format: str) -> pd.DataFrame:
+    """Applies the column format rules for one output format to a copy of the columns they cover."""
+    rendered = {}
+    for rule in column_formats:
+        if output_format not in rule.get('formats', ['xlsx']):
+            continue
+        for col in rule['columns']:
+            if col in df.columns:
+                values = df[col].astype(object)
+                # as with any replace, 1 and 0 are rendered like True and False
+                values = values.replace({True: rule.get('true', 'TRUE'), False: rule.get('false', 'FALSE')})
+                rendered[col] = values.where(df[col].notna(), rule.get('missing', ''))
+    return df.assign(**rendered) if rendered else df
+
+
+def write_outputs(outputs: List[Tuple[pd.DataFrame, List[OutputTarget]]], max_workers: int = None,
+                  column_formats: List[dict] = ()):
+    """Serializes every frame once per format and copies the result to that format's other destinations.
+
+    Each (frame, format) pair is an independent file and is written on its own thread. Column format rules
+    are applied while writing each format, so the frames themselves keep their dtypes.
+    """
+    jobs = [(df, output_format, paths, column_formats)
+            for df, targets in outputs
+            for output_format, paths in group_targets_by_format(targets).items()]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(_write_frame, *job) for job in jobs]:
+            future.result()
+
+
+def _write_frame(df: pd.DataFrame, output_format: str, paths: List[str], column_formats: List[dict] = ()):
+    writer = _open_chunk_writer(output_format, paths[0], streaming=False)
+    writer.write(render_columns(df, column_formats, output_format))
+    writer.close()
+    _copy_to_remaining_paths(paths)
+
+
+def _copy_to_remaining_paths(paths: List[str]):
+    for path in paths[1:]:
+        shutil.copyfile(paths[0], path)
+
+
+class StreamingOutputWriter:
+    """Appends DataFrame chunks to every output target without holding the full frame in memory."""
+
+    def __init__(self, targets: List[OutputTarget], column_formats: List[dict] = ()):
+        self.paths_by_format = group_targets_by_format(targets)
+        self.column_formats = column_formats
+        self.columns = None
+        self._writers = {}
+
+    def __enter__(self):
+        for output_format, paths in self.paths_by_format.items():
+            self._writers[output_format] = _open_chunk_writer(output_format, paths[0], streaming=True)
+        return self
+
+    def write(self, df: pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        elif set(df.columns) != set(self.columns):
+            # reindexing would silently drop a column the first chunk lacked, or fill one with NaN of the wrong type
+            raise ValueError(f'A chunk has the columns {list(df.columns)}, but the first chunk written had {self.columns}')
+        df = df[self.columns]
+        for output_format, writer in self._writers.items():
+            writer.write(render_columns(df, self.column_formats, output_format))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for writer in self._writers.values():
+            writer.close()
+        if exc_type is None:
+            for paths in self.paths_by_format.values():
+                _copy_to_remaining_paths(paths)
+
+
+class CsvChunkWriter:
+
+    def __init__(self, path: str):
+        self.path = path
+        self._has_header = False
+
+    def write(self, df: pd.DataFrame):
+        df.to_csv(self.path, mode='a' if self._has_header else 'w', header=not self._has_header, index=False)
+        self._has_header = True
+
+    def close(self):
+        if not self._has_header:
+            open(self.path, 'w').close()
+
+
+class ParquetChunkWriter:
+
+    def __init__(self, path: str, widen_schema: bool = True):
+        self.path = path
+        self.widen_schema = widen_schema
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame):
+        if self._writer is None:
+            self._schema = pa.Schema.from_pandas(df, preserve_index=False)
+            if self.widen_schema:
+                self._schema = _widen_schema(self._schema)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _widen_schema(schema):
+    # the first chunk fixes the file schema, so leave room for what later chunks may contain:
+    # text in columns that were blank so far, missing values in integer columns, and more categories
+    fields = []
+    for field in schema:
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_integer(field.type):
+            field = field.with_type(pa.float64())
+        elif pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class XlsxChunkWriter:
+    """Writes rows in order with xlsxwriter's constant_memory mode, which flushes each row as soon as it is done."""
+
+    def __init__(self, path: str):
+        import xlsxwriter
+        self._workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        self._worksheet = self._workbook.add_worksheet('Sheet1')
+        self._header_format = self._workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+        self._next_row = 0
+
+    def write(self, df: pd.DataFrame):
+        if self._next_row == 0:
+            self._worksheet.write_row(0, 0, list(df.columns), self._header_format)
+            self._next_row = 1
+        # xlsxwriter skips rows past the sheet's last row instead of raising, so check before anything is written
+        if self._next_row + len(df) > XLSX_MAX_ROWS:
+            raise ValueError(f'This sheet is too large! {self._next_row - 1 + len(df)} rows do not fit in the '
+                             f'{XLSX_MAX_ROWS - 1} data rows of an Excel sheet; write this output as CSV or Parquet instead')
+        rows = df.astype(object)
+        rows = rows.where(rows.notna(), None)
+        for row in rows.itertuples(index=False, name=None):
+            if self._worksheet.write_row(self._next_row, 0, row) == -1:
+                raise ValueError(f'Row {self._next_row} is outside the range of an Excel sheet')
+            self._next_row += 1
+
+    def close(self):
+        self._workbook.close()
+
+
+CHUNK_WRITERS = {
+    'xlsx': XlsxChunkWriter,
+    'csv': CsvChunkWriter,
+    'parquet': ParquetChunkWriter,
+}
+
+
+def _open_chunk_writer(output_format: str, path: str, streaming: bool):
+    if output_format == 'parquet':
+        # a frame written in one go has nothing to leave room for, so it keeps its own types
+        return ParquetChunkWriter(path, widen_schema=streaming)
+    return CHUNK_WRITERS[output_format](path)
@@ -0,0 +1,121 @@
+import re
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import fds_etl.src.data_manipulation as dm
+from fds_etl.src.recodes import RecodeRules
+
+
+def _as_objects(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype(object).where(df.notna(), None)
+
+
+class TestArrowStringsAreKept(unittest.TestCase):
+    """Every text-handling step is run on the same frame with and without Arrow strings. The Arrow run
+    must return the same values, with its text columns still stored as Arrow strings."""
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'hopkins_id': ['A1', 'A1', 'B2', 'C3'],
+            'outcome': ['Working', 'Working', 'Still Looking', 'Fellowship'],
+            'employment_type': ['Full-Time', 'Full-Time', None, 'Fellowship'],
+            'is_internship': ['No', 'No', None, 'No'],
+            'still_seeking_option': [None, None, 'Employment', None],
+            'is_fellowship': ['No', 'No', None, 'Yes'],
+            'employer_name': ['Johns Hopkins Hospital', 'Johns Hopkins Hospital', None, 'Fulbright'],
+            'cont_ed_school': [None, None, 'The Johns Hopkins University', None],
+            'major': ['Biology', 'Psychology', 'History', 'Physics'],
+            'degree': ['B.S.', 'B.A.', 'B.A.', 'B.S.'],
+        })
+
+    def test_steps_keep_arrow_strings(self):
+        steps = {
+            'recode_fellowship_responses': (dm.recode_fellowship_responses, ['outcome', 'employer_name']),
+            'split_working_outcomes': (dm.split_working_outcomes_into_full_and_part_time, ['outcome', 'employer_name']),
+            'split_still_looking_outcomes': (dm.split_still_looking_outcomes_into_work_and_school, ['outcome']),
+            'add_is_jhu_column': (dm.add_is_jhu_column, ['employer_name', 'cont_ed_school']),
+            'create_shortform_df': (lambda df: dm.create_shortform_df(df, ['major', 'degree']), ['hopkins_id', 'outcome']),
+        }
+        for name, (step, text_columns) in steps.items():
+            with self.subTest(step=name):
+                expected = step(self.df.copy())
+                result = step(dm.convert_text_columns_to_arrow(self.df.copy()))
+                self.assertEqual([col for col in text_columns if not dm.is_arrow_string_dtype(result[col])], [])
+                assert_frame_equal(_as_objects(result), _as_objects(expected))
+
+    def test_shortform_accumulator_keeps_arrow_strings(self):
+        df = dm.convert_text_columns_to_arrow(self.df.copy())
+        accumulator = dm.ShortformAccumulator(['major', 'degree'])
+        accumulator.add(df.iloc[:2])
+        accumulator.add(df.iloc[2:])
+        result = accumulator.result()
+        self.assertTrue(dm.is_arrow_string_dtype(result['hopkins_id']))
+        assert_frame_equal(_as_objects(result), _as_objects(dm.create_shortform_df(self.df.copy(), ['major', 'degree'])))
+
+    def test_recodes_writing_text_keep_arrow_strings(self):
+        rules = RecodeRules([{'when': {'column': 'outcome', 'equals': 'Fellowship'},
+                              'set': {'employer_name': {'column': 'is_fellowship'}, 'outcome': 'Working'}}])
+        result = rules.apply(dm.convert_text_columns_to_arrow(self.df.copy()))
+        self.assertTrue(dm.is_arrow_string_dtype(result['employer_name']))
+        self.assertTrue(dm.is_arrow_string_dtype(result['outcome']))
+        self.assertEqual(result['employer_name'].tolist()[3], 'Yes')
+
+
+class TestContainsPattern(unittest.TestCase):
+    """The Arrow backend matches with RE2, the pandas backend with Python's re; both must agree."""
+
+    def test_arrow_and_python_matches_agree(self):
+        values = [
+            'Johns Hopkins',
+            'Johns\u00a0Hopkins',  # no-break space, which RE2's \s does not match
+            'Johns\u2003Hopkins',
+            'Johns\x0bHopkins',
+            'Johns\nHopkins',
+            'JOHNS HOPK\u0130NS',  # dotted capital I, which RE2 folds to i but lowercases to i and a combining dot
+            'Johns Hopkins\n',
+            'Hopkins',
+            '',
+            None,
+        ]
+        patterns = [r'johns\s+hopkins', r'hopkins$', r'^johns', r'\bhopkins\b', r'johns.hopkins']
+        series = pd.Series(values, dtype=object)
+        arrow_series = dm.convert_text_columns_to_arrow(series.to_frame('name'))['name']
+        self.assertTrue(dm.is_arrow_string_dtype(arrow_series))
+        for pattern in patterns:
+            with self.subTest(pattern=pattern):
+                compiled = re.compile(pattern, flags=re.IGNORECASE)
+                self.assertEqual(dm._contains_pattern(arrow_series, compiled).tolist(),
+                                 dm._contains_pattern(series, compiled).tolist())
+
+
+class TestConvertTextColumnsToArrow(unittest.TestCase):
+
+    def test_converts_only_columns_holding_text(self):
+        df = dm.convert_text_columns_to_arrow(pd.DataFrame({
+            'text': ['a', None],
+            'blank': [None, None],
+            'flags': [True, None],
+            'score': [1.0, 2.0],
+        }))
+        self.assertEqual([dm.is_arrow_string_dtype(df[col]) for col in df.columns], [True, False, False, False])
+
+    def test_recodes_writing_non_text_values_keep_the_column_writable(self):
+        df = dm.convert_text_columns_to_arrow(pd.DataFrame({
+            'military_branch': ['U.S. Navy', None],
+            'military_rank': ['Ensign', None],
+            'military_specialization': ['Aviation', None],
+            'is_internship': ['No', 'Yes'],
+        }))
+        df = dm.recode_military_responses(df)
+        assert_frame_equal(df[['is_internship']], pd.DataFrame({'is_internship': [False, 'Yes']}))
+
+    def test_matches_jhu_patterns_with_arrow_kernels(self):
+        df = dm.convert_text_columns_to_arrow(pd.DataFrame({
+            'employer_name': ['JOHNS  HOPKINS Hospital', None, 'Hopkins'],
+            'cont_ed_school': [None, 'The Johns Hopkins University', ''],
+        }))
+        self.assertEqual(dm.add_is_jhu_column(df)['is_jhu'].tolist(), [True, True, False])
+        self.assertEqual(df['is_jhu'].dtype, np.dtype(bool))
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fds_etl.benchmarks.synthetic import generate_dataset
+from fds_etl.src.batch import execute_batch, parquet_output_path
+
+
+class TestParquetOutputPath(unittest.TestCase):
+
+    def test_picks_the_parquet_output(self):
+        self.assertEqual(parquet_output_path(['out.csv', {'path': 'out.dat', 'format': 'parquet'}]), 'out.dat')
+
+    def test_outputs_without_parquet_raise(self):
+        with self.assertRaises(ValueError):
+            parquet_output_path(['out.csv', 'out.xlsx'])
+
+
+class TestExecuteBatch(unittest.TestCase):
+
+    def test_cleans_every_year_and_combines_the_outputs_in_config_order(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            configs = []
+            for seed, year in enumerate(['2019-2020', '2020-2021']):
+                year_dir = os.path.join(temp_dir, year)
+                os.makedirs(year_dir)
+                config = generate_dataset(year_dir, 120, seed=seed)
+                config['fds_year'] = year
+                config['longform_output_files'] = [os.path.join(year_dir, 'longform.parquet')]
+                config['shortform_output_files'] = [os.path.join(year_dir, 'shortform.parquet')]
+                configs.append(config)
+            combined_longform = os.path.join(temp_dir, 'longform.parquet')
+            combined_shortform = os.path.join(temp_dir, 'shortform.csv')
+            execute_batch(configs, max_workers=2, longform_output_files=[combined_longform], shortform_output_files=[combined_shortform])
+
+            longform_df = pd.read_parquet(combined_longform)
+            yearly_dfs = [pd.read_parquet(config['longform_output_files'][0]) for config in configs]
+            assert_frame_equal(longform_df, pd.concat(yearly_dfs, ignore_index=True))
+            self.assertEqual(longform_df['fds_year'].unique().tolist(), ['2019-2020', '2020-2021'])
+            self.assertEqual(len(pd.read_csv(combined_shortform)),
+                             sum(len(pd.read_parquet(config['shortform_output_files'][0])) for config in configs))
+
+    def test_checks_every_year_before_cleaning_any(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config = generate_dataset(temp_dir, 20, seed=0)
+            config['longform_output_files'] = [os.path.join(temp_dir, 'longform.xlsx')]
+            with mock.patch('fds_etl.src.main.execute') as execute, self.assertRaises(ValueError):
+                execute_batch([config], longform_output_files=[os.path.join(temp_dir, 'combined.parquet')])
+            execute.assert_not_called()
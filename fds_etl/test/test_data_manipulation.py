@@ -1,5 +1,8 @@
+import tracemalloc
 import unittest
+from unittest import mock
 
+import numpy as np
 import pandas as pd
 from numpy import nan
 from pandas.testing import assert_frame_equal
@@ -89,6 +92,23 @@ class TestIsJHU(unittest.TestCase):
     def test_complex_hopkins_str_is_jhu(self):
         self.assertTrue(dm.is_jhu('   !!!! The johnS   hOPKINS AP   L     '))
 
+    def test_custom_patterns_are_jhu(self):
+        self.assertTrue(dm.is_jhu('JHU School of Medicine', [r'johns\s+hopkins', r'\bjhu\b']))
+        self.assertFalse(dm.is_jhu('JHUniversal Corp', [r'johns\s+hopkins', r'\bjhu\b']))
+
+    def test_patterns_spelled_in_capitals_still_match(self):
+        self.assertTrue(dm.is_jhu('jhu apl', [r'\bJHU\b']))
+
+    def test_matches_on_any_line(self):
+        # unlike the original re.match('.*johns\s+hopkins.*', ...), whose .* stopped at the first newline
+        self.assertTrue(dm.is_jhu('Acme Corp\nJohns Hopkins Hospital'))
+        self.assertTrue(dm.is_jhu('Johns\nHopkins'))
+
+    def test_matches_the_lowercased_name(self):
+        # a dotted capital I lowercases to i and a combining dot, as it did when the names were lowercased by hand
+        self.assertFalse(dm.is_jhu('JOHNS HOPK\u0130NS'))
+        self.assertTrue(dm.is_jhu('JOHNS\u00a0HOPKINS'))
+
 
 class TestAddIsJHUColumn(unittest.TestCase):
 
@@ -113,6 +133,45 @@ class TestAddIsJHUColumn(unittest.TestCase):
         })
         self.assertFalse(dm.add_is_jhu_column(df)['is_jhu'][0])
 
+    def test_matches_is_jhu_for_blank_values(self):
+        df = pd.DataFrame({
+            'employer_name': [None, nan, '', 'The johnS   hOPKINS AP   L'],
+            'cont_ed_school': [nan, '', None, None]
+        })
+        expected = [bool(dm.is_jhu(e) or dm.is_jhu(s)) for e, s in zip(df['employer_name'], df['cont_ed_school'])]
+        self.assertEqual(dm.add_is_jhu_column(df)['is_jhu'].tolist(), expected)
+
+    def test_entirely_blank_columns_are_not_jhu(self):
+        df = pd.DataFrame({'employer_name': [nan, nan], 'cont_ed_school': [nan, nan]})
+        self.assertEqual(dm.add_is_jhu_column(df)['is_jhu'].tolist(), [False, False])
+
+    def test_matches_categorical_columns(self):
+        df = pd.DataFrame({
+            'employer_name': pd.Categorical(['Johns Hopkins APL', nan, 'Google']),
+            'cont_ed_school': pd.Categorical([nan, 'Johns Hopkins SAIS', nan]),
+        })
+        self.assertEqual(dm.add_is_jhu_column(df)['is_jhu'].tolist(), [True, True, False])
+
+    def test_matches_is_jhu_for_every_column_type(self):
+        names = ['Acme Corp\nJohns Hopkins Hospital', 'JOHNS HOPK\u0130NS', 'JOHNS\u00a0HOPKINS', 'johns hopkins', 'Hopkins', None]
+        expected = [dm.is_jhu(name) for name in names]
+        columns = {
+            'object': pd.Series(names, dtype=object),
+            'categorical': pd.Series(pd.Categorical(names)),
+            'arrow': dm.convert_text_columns_to_arrow(pd.DataFrame({'name': names}))['name'],
+        }
+        for column_type, column in columns.items():
+            with self.subTest(column_type=column_type):
+                df = pd.DataFrame({'employer_name': column, 'cont_ed_school': [None] * len(names)})
+                self.assertEqual(dm.add_is_jhu_column(df)['is_jhu'].tolist(), expected)
+
+    def test_uses_custom_patterns(self):
+        df = pd.DataFrame({
+            'employer_name': ['JHU', 'Accenture'],
+            'cont_ed_school': [None, 'JHU Carey']
+        })
+        self.assertEqual(dm.add_is_jhu_column(df, [r'\bjhu\b'])['is_jhu'].tolist(), [True, True])
+
 
 class TestRecodeResponseStatusAsIsSubmitted(unittest.TestCase):
 
@@ -134,6 +193,10 @@ class TestRecodeResponseStatusAsIsSubmitted(unittest.TestCase):
         df = pd.DataFrame({'response_status': ['submitted']})
         self.assertFalse('response_status' in dm.recode_response_status_as_is_submitted(df).columns)
 
+    def test_keeps_response_status_column_when_drops_are_deferred(self):
+        df = pd.DataFrame({'response_status': ['submitted']})
+        self.assertTrue('response_status' in dm.recode_response_status_as_is_submitted(df, drop=False).columns)
+
 
 class TestAddConsolidatedLDLNPSColumns(unittest.TestCase):
 
@@ -155,6 +218,11 @@ class TestAddConsolidatedLDLNPSColumns(unittest.TestCase):
         self.assertFalse('ldl_nps_2' in dm.add_consolidated_ldl_nps_columns(df).columns)
         self.assertFalse('ldl_nps_3' in dm.add_consolidated_ldl_nps_columns(df).columns)
 
+    def test_keeps_original_nps_columns_when_drops_are_deferred(self):
+        df = pd.DataFrame({'ldl_nps_1': [7], 'ldl_nps_2': [8], 'ldl_nps_3': [9]})
+        self.assertEqual(list(dm.add_consolidated_ldl_nps_columns(df, drop=False).columns),
+                         ['ldl_nps_1', 'ldl_nps_2', 'ldl_nps_3', 'avg_ldl_nps', 'max_ldl_nps', 'min_ldl_nps'])
+
 
 class TestSplitWorkingOutcomesIntoFullAndPartTime(unittest.TestCase):
 
@@ -209,20 +277,20 @@ class TestRecodeFellowshipResponses(unittest.TestCase):
         self.assertFalse('is_fellowship' in dm.recode_fellowship_responses(df).columns)
 
 
-class TestRecodeBooleanColumnsToExcelFriendlyStrings(unittest.TestCase):
+class TestConvertFlagColumnsToBooleans(unittest.TestCase):
 
-    def test_converts_blanks_and_nans_to_empty_string(self):
-        df = pd.DataFrame({'field': [nan, None, '']})
-        expected = pd.DataFrame({'field': ['', '', '']})
-        assert_frame_equal(expected, dm.recode_boolean_columns_to_excel_friendly_strings(df, ['field']))
+    def test_converts_0_and_1_to_nullable_booleans(self):
+        df = pd.DataFrame({'field': [0, 1, nan]})
+        expected = pd.DataFrame({'field': pd.array([False, True, None], dtype='boolean')})
+        assert_frame_equal(dm.convert_flag_columns_to_booleans(df, ['field']), expected)
 
-    def test_converts_0_to_false_string(self):
-        df = pd.DataFrame({'field': [0]})
-        self.assertEqual(dm.recode_boolean_columns_to_excel_friendly_strings(df, ['field'])['field'][0], 'FALSE')
+    def test_entirely_blank_column_becomes_missing_booleans(self):
+        df = pd.DataFrame({'field': [nan, None]})
+        self.assertEqual(dm.convert_flag_columns_to_booleans(df, ['field'])['field'].dtype, 'boolean')
 
-    def test_converts_1_to_true_string(self):
-        df = pd.DataFrame({'field': [1]})
-        self.assertEqual(dm.recode_boolean_columns_to_excel_friendly_strings(df, ['field'])['field'][0], 'TRUE')
+    def test_leaves_columns_with_other_values_unchanged(self):
+        df = pd.DataFrame({'field': ['Y', 'N', nan]})
+        assert_frame_equal(dm.convert_flag_columns_to_booleans(df.copy(), ['field']), df)
 
 
 class TestExpandExperientialLearningColumn(unittest.TestCase):
@@ -241,6 +309,24 @@ class TestExpandExperientialLearningColumn(unittest.TestCase):
         self.assertTrue(expanded_df.iloc[0]['did_research'])
         self.assertFalse(expanded_df.iloc[1]['did_research'])
 
+    def test_matches_values_literally(self):
+        df = pd.DataFrame({'activities_at_jhu': ['Internship (paid), Study abroad', 'Internship']})
+        value_to_col_name_map = {'Internship (paid)': 'did_paid_internship', '.': 'did_anything'}
+        expanded_df = dm.expand_experiential_learning_column(df, value_to_col_name_map)
+        self.assertEqual(expanded_df['did_paid_internship'].tolist(), [True, False])
+        self.assertEqual(expanded_df['did_anything'].tolist(), [False, False])
+
+    def test_missing_responses_are_missing(self):
+        df = pd.DataFrame({'activities_at_jhu': [nan, 'research', None]})
+        expanded_df = dm.expand_experiential_learning_column(df, {'research': 'did_research'})
+        self.assertEqual(expanded_df['did_research'].dtype, 'boolean')
+        self.assertEqual(expanded_df['did_research'].tolist(), [pd.NA, True, pd.NA])
+
+    def test_entirely_blank_column_is_missing(self):
+        df = pd.DataFrame({'activities_at_jhu': [nan, nan]})
+        expanded_df = dm.expand_experiential_learning_column(df, {'research': 'did_research'})
+        self.assertTrue(expanded_df['did_research'].isna().all())
+
 
 class TestCreateShortformDF(unittest.TestCase):
 
@@ -262,3 +348,118 @@ class TestCreateShortformDF(unittest.TestCase):
             'college': ['ksas', 'ksas; wse']
         })
         assert_frame_equal(dm.create_shortform_df(df, ['major', 'degree', 'college']), expected)
+
+    def test_groups_rows_with_missing_id_values_together(self):
+        df = pd.DataFrame({
+            'id_field': ['a', 'a', nan, None],
+            'other_field': [nan, None, 'x', 'x'],
+            'major': ['Psych', 'Comp Sci', 'Biology', 'Chemistry'],
+        })
+        expected = pd.DataFrame({
+            'id_field': [nan, 'a'],
+            'other_field': ['x', nan],
+            'major': ['Biology; Chemistry', 'Comp Sci; Psych'],
+        })
+        assert_frame_equal(dm.create_shortform_df(df, ['major']), expected)
+
+    def test_ignores_missing_values_when_collapsing(self):
+        df = pd.DataFrame({'id_field': ['a', 'a', 'b'], 'major': ['Psych', nan, nan]})
+        shortform_df = dm.create_shortform_df(df, ['major'])
+        self.assertEqual(shortform_df['major'][0], 'Psych')
+        self.assertTrue(pd.isna(shortform_df['major'][1]))
+
+
+class TestCategorizeLowCardinalityColumns(unittest.TestCase):
+
+    def test_converts_only_text_columns_with_few_distinct_values(self):
+        df = pd.DataFrame({
+            'outcome': ['Working', 'Working', 'Working', nan],
+            'hopkins_id': ['a', 'b', 'c', 'd'],
+            'score': [1, 1, 1, 1],
+        })
+        categorized_df = dm.categorize_low_cardinality_columns(df, 0.5)
+        self.assertEqual(categorized_df['outcome'].dtype, 'category')
+        self.assertEqual(categorized_df['hopkins_id'].dtype, object)
+        self.assertEqual(categorized_df['score'].dtype, 'int64')
+
+    def test_constant_columns_hold_the_value_in_every_row(self):
+        column = dm.constant_column('2020-2021', 3)
+        self.assertEqual(list(column), ['2020-2021'] * 3)
+        self.assertEqual(column.codes.dtype, 'int8')
+
+    def test_shortform_sorts_categorical_columns_by_value(self):
+        df = pd.DataFrame({
+            'id_field': pd.Categorical(['b', 'a', 'c'], categories=['c', 'b', 'a']),
+            'major': ['Psych', 'Comp Sci', 'Biology'],
+        })
+        self.assertEqual(dm.create_shortform_df(df, ['major'])['id_field'].tolist(), ['a', 'b', 'c'])
+
+
+def _longform(n_rows: int) -> pd.DataFrame:
+    # two rows per response in shuffled order, with a different major in each
+    ids = np.random.default_rng(0).permutation(n_rows // 2).repeat(2)
+    return pd.DataFrame({
+        'id_field': [f'id{i:07d}' for i in ids],
+        'college': np.where(ids % 3 == 0, 'Arts & Sciences', np.where(ids % 3 == 1, '', None)),
+        'score': np.where(ids % 5 == 0, nan, ids % 10 - 4.5),
+        'major': np.tile(['Biology', 'History'], n_rows // 2),
+        'degree': np.where(ids % 2 == 0, 'B.A.', 'B.S.'),
+    })
+
+
+class TestShortformAccumulator(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'id_field': ['osfij4', 'jfjefu', 'osfij4', 'osfij4', 'abcdef'],
+            'yet_another_field': [1, nan, 1, 1, nan],
+            'major': ['Comp Sci', 'Biology', 'Psych', 'English', nan],
+            'degree': ['B.S.', 'M.A.', 'B.A.', 'B.A.', nan],
+        })
+
+    def test_matches_create_shortform_df_across_chunk_boundaries(self):
+        accumulator = dm.ShortformAccumulator(['major', 'degree'])
+        accumulator.add(self.df.iloc[:2])
+        accumulator.add(self.df.iloc[2:])
+        assert_frame_equal(accumulator.result(), dm.create_shortform_df(self.df, ['major', 'degree']))
+
+    def test_groups_values_whose_dtype_differs_between_chunks(self):
+        accumulator = dm.ShortformAccumulator(['major', 'degree'])
+        accumulator.add(pd.DataFrame({'id_field': ['a'], 'count': [1], 'major': ['Psych'], 'degree': ['B.A.']}))
+        accumulator.add(pd.DataFrame({'id_field': ['a', 'b'], 'count': [1.0, nan], 'major': ['English', 'Biology'], 'degree': ['B.A.', 'B.S.']}))
+        shortform_df = accumulator.result()
+        self.assertEqual(len(shortform_df), 2)
+        self.assertEqual(shortform_df['major'].tolist(), ['English; Psych', 'Biology'])
+
+    def test_rejects_chunks_whose_columns_differ_from_the_first(self):
+        accumulator = dm.ShortformAccumulator(['major', 'degree'])
+        accumulator.add(pd.DataFrame({'id_field': ['a'], 'major': ['Psych'], 'degree': ['B.A.']}))
+        with self.assertRaises(ValueError):
+            accumulator.add(pd.DataFrame({'id_field': ['b'], 'fellowship_org': ['Fulbright'], 'major': ['Biology'], 'degree': ['B.S.']}))
+
+    def test_matches_create_shortform_df_when_runs_are_merged_in_several_rounds(self):
+        df = _longform(600)
+        with mock.patch('fds_etl.src.data_manipulation.MERGE_FAN_IN', 3):
+            accumulator = dm.ShortformAccumulator(['major', 'degree'])
+            for start in range(0, len(df), 40):
+                accumulator.add(df.iloc[start:start + 40])
+            assert_frame_equal(accumulator.result(), dm.create_shortform_df(df, ['major', 'degree']))
+
+    def test_peak_memory_does_not_grow_with_the_number_of_rows(self):
+        def peak_bytes(n_rows: int) -> int:
+            df = _longform(n_rows)
+            accumulator = dm.ShortformAccumulator(['major', 'degree'])
+            tracemalloc.start()
+            try:
+                for start in range(0, n_rows, 500):
+                    accumulator.add(df.iloc[start:start + 500])
+                for _ in accumulator.batches():
+                    pass
+                return tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        # a smaller fan-in and row groups keep the merge's share of the peak within one chunk at these sizes
+        with mock.patch('fds_etl.src.data_manipulation.MERGE_FAN_IN', 4), \
+                mock.patch('fds_etl.src.data_manipulation.MIN_SPILL_ROW_GROUP_ROWS', 64):
+            self.assertLess(peak_bytes(8000), 1.5 * peak_bytes(2000))
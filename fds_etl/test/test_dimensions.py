@@ -0,0 +1,53 @@
+import unittest
+
+import pandas as pd
+from numpy import nan
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src.dimensions import DimensionLookup
+
+
+class TestDimensionLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.demographics = pd.DataFrame({
+            'hopkins_id': ['A1', 'b2 ', 'c3'],
+            'is_athlete': [1, 0, nan],
+            'is_urm': [0, 1, 1],
+        })
+
+    def test_attaches_columns_like_a_left_merge(self):
+        df = pd.DataFrame({'hopkins_id': ['a1', 'zz', 'b2', 'a1'], 'outcome': ['Working', 'Fellowship', 'Working', 'Military']})
+        expected = df.merge(self.demographics.assign(hopkins_id=['a1', 'b2', 'c3']), how='left', on='hopkins_id')
+        assert_frame_equal(DimensionLookup(self.demographics, 'hopkins_id').attach(df), expected)
+
+    def test_counts_matched_and_unmatched_rows(self):
+        lookup = DimensionLookup(self.demographics, 'hopkins_id')
+        lookup.attach(pd.DataFrame({'hopkins_id': ['a1', 'zz', nan]}))
+        self.assertEqual((lookup.matched_rows, lookup.unmatched_rows), (1, 2))
+
+    def test_attaches_only_the_selected_columns(self):
+        df = DimensionLookup(self.demographics, 'hopkins_id', ['is_urm']).attach(pd.DataFrame({'hopkins_id': ['c3']}))
+        self.assertEqual(list(df.columns), ['hopkins_id', 'is_urm'])
+
+    def test_rejects_unknown_columns(self):
+        with self.assertRaises(ValueError):
+            DimensionLookup(self.demographics, 'hopkins_id', ['is_pell_eligible'])
+
+    def test_keeps_the_row_count_when_the_dimension_has_duplicate_keys(self):
+        demographics = pd.concat([self.demographics, pd.DataFrame({'hopkins_id': ['a1'], 'is_athlete': [0], 'is_urm': [0]})])
+        df = DimensionLookup(demographics, 'hopkins_id').attach(pd.DataFrame({'hopkins_id': ['a1', 'b2']}))
+        self.assertEqual(df['is_athlete'].tolist(), [1, 0])
+
+    def test_reports_duplicate_keys_and_whether_their_rows_conflict(self):
+        demographics = pd.DataFrame({'hopkins_id': ['a1', 'A1', 'b2', 'b2', 'c3'], 'is_urm': [0, 1, 1, 1, 0]})
+        expected = pd.DataFrame({'hopkins_id': ['a1', 'b2'], 'rows': [2, 2], 'conflicting': [True, False]})
+        assert_frame_equal(DimensionLookup(demographics, 'hopkins_id').duplicate_report(), expected)
+
+    def test_reports_no_duplicates_for_unique_keys(self):
+        self.assertTrue(DimensionLookup(self.demographics, 'hopkins_id').duplicate_report().empty)
+
+    def test_can_reject_duplicate_keys(self):
+        demographics = pd.DataFrame({'hopkins_id': ['a1', 'a1'], 'is_urm': [0, 1]})
+        with self.assertRaises(ValueError):
+            DimensionLookup(demographics, 'hopkins_id', on_duplicate='error')
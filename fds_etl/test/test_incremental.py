@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import fds_etl.src.incremental as incremental
+
+
+def responses(majors: dict) -> pd.DataFrame:
+    rows = [(hopkins_id, 'Undergraduate', major) for hopkins_id, student_majors in majors.items() for major in student_majors]
+    return pd.DataFrame(rows, columns=['hopkins_id', 'education_level', 'jhu_major'])
+
+
+def fingerprints(df: pd.DataFrame) -> pd.Series:
+    return incremental.fingerprint_responses(df, incremental.key_hashes(df))
+
+
+class TestFingerprintResponses(unittest.TestCase):
+
+    def test_has_one_fingerprint_per_key(self):
+        df = responses({'a': ['Biology', 'Psych'], 'b': ['English']})
+        self.assertEqual(len(fingerprints(df)), 2)
+
+    def test_does_not_depend_on_row_order(self):
+        df = responses({'a': ['Biology', 'Psych'], 'b': ['English']})
+        self.assertTrue(fingerprints(df).equals(fingerprints(df.iloc[::-1])))
+
+    def test_changes_when_one_of_a_keys_rows_changes(self):
+        before = fingerprints(responses({'a': ['Biology', 'Psych'], 'b': ['English']}))
+        after = fingerprints(responses({'a': ['Biology', 'History'], 'b': ['English']}))
+        self.assertEqual((before != after).sum(), 1)
+
+
+class TestFindStaleKeys(unittest.TestCase):
+
+    def test_finds_changed_added_and_removed_keys(self):
+        before = responses({'same': ['Biology'], 'changed': ['Psych'], 'removed': ['English']})
+        after = responses({'same': ['Biology'], 'changed': ['Psych', 'English'], 'added': ['History']})
+        stale_keys = incremental.find_stale_keys(fingerprints(before), fingerprints(after))
+        expected = incremental.key_hashes(responses({'changed': ['Psych'], 'removed': ['English'], 'added': ['History']}))
+        self.assertEqual(sorted(stale_keys), sorted(expected))
+
+
+class TestReplaceStaleRows(unittest.TestCase):
+
+    def test_replaces_only_the_rows_of_stale_keys(self):
+        previous_df = responses({'same': ['Biology'], 'changed': ['Psych'], 'removed': ['English']})
+        delta_df = responses({'changed': ['Psych', 'English'], 'added': ['History']})
+        stale_keys = incremental.key_hashes(responses({'changed': [''], 'removed': [''], 'added': ['']}))
+        expected = responses({'same': ['Biology'], 'changed': ['Psych', 'English'], 'added': ['History']})
+        assert_frame_equal(incremental.replace_stale_rows(previous_df, delta_df, stale_keys), expected)
+
+
+class TestSaveState(unittest.TestCase):
+
+    def test_summary_cells_are_only_kept_while_they_are_saved(self):
+        df = responses({'a': ['Biology']})
+        cells = pd.DataFrame({'jhu_major': ['Biology'], 'responses': [1]})
+        with tempfile.TemporaryDirectory() as state_dir:
+            incremental.save_state(state_dir, 'settings', fingerprints(df), df, df, cells)
+            assert_frame_equal(incremental.load_summary_cells(state_dir), cells)
+            incremental.save_state(state_dir, 'settings', fingerprints(df), df, df)
+            self.assertIsNone(incremental.load_summary_cells(state_dir))
+
+
+class TestOrderLikeSource(unittest.TestCase):
+
+    def test_puts_every_row_at_the_position_of_its_raw_row(self):
+        source = responses({'a': ['Biology', 'Psych'], 'b': ['English'], 'c': ['History']})
+        source = source.iloc[[0, 2, 1, 3]].reset_index(drop=True)
+        # a key's rows keep their relative order through cleaning and replace_stale_rows
+        merged = source.iloc[[1, 3, 0, 2]]
+        assert_frame_equal(incremental.order_like_source(merged, incremental.key_hashes(source)), source)
@@ -0,0 +1,86 @@
+import unittest
+
+import pandas as pd
+from numpy import nan
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src.locations import LocationResolver, normalize_location
+
+
+class TestNormalizeLocation(unittest.TestCase):
+
+    def test_ignores_case_whitespace_and_punctuation(self):
+        self.assertEqual(normalize_location('  New York,NY '), 'new york ny')
+        self.assertEqual(normalize_location('Washington D.C.'), 'washington dc')
+
+
+class TestLocationResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.mapping = pd.DataFrame({
+            'raw_location': ['Baltimore, MD', 'Washington, DC', 'New York, NY'],
+            'city': ['Baltimore', 'Washington', 'New York'],
+            'state': ['Maryland', 'District of Columbia', 'New York'],
+        })
+
+    def cities(self, resolver: LocationResolver, locations: list) -> list:
+        return resolver.resolve(pd.Series(locations))['city'].tolist()
+
+    def test_resolves_exact_matches(self):
+        expected = pd.DataFrame({'city': ['Baltimore', nan], 'state': ['Maryland', nan]}, index=[5, 6])
+        assert_frame_equal(LocationResolver(self.mapping).resolve(pd.Series(['Baltimore, MD', nan], index=[5, 6])), expected)
+
+    def test_resolves_spelling_variants(self):
+        resolver = LocationResolver(self.mapping)
+        self.assertEqual(self.cities(resolver, ['baltimore,md ', 'Washington D.C.', 'NY, New York']),
+                         ['Baltimore', 'Washington', 'New York'])
+
+    def test_resolves_close_misspellings_fuzzily(self):
+        resolver = LocationResolver(self.mapping, fuzzy_cutoff=0.9)
+        self.assertEqual(self.cities(resolver, ['Baltimroe, MD']), ['Baltimore'])
+        self.assertEqual(resolver.learned_mapping()['method'].tolist(), ['fuzzy'])
+
+    def test_leaves_misspellings_unmatched_without_a_fuzzy_cutoff(self):
+        resolver = LocationResolver(self.mapping)
+        self.assertEqual(self.cities(resolver, ['Baltimroe, MD', 'MD, Baltimore']), [nan, 'Baltimore'])
+        self.assertEqual(resolver.learned_mapping()['method'].tolist(), ['unmatched', 'word_order'])
+
+    def test_ignores_learned_fuzzy_matches_without_a_fuzzy_cutoff(self):
+        resolver = LocationResolver(self.mapping, fuzzy_cutoff=0.9)
+        self.cities(resolver, ['Baltimroe, MD'])
+        self.assertEqual(self.cities(LocationResolver(self.mapping, resolver.learned_mapping()), ['Baltimroe, MD']), [nan])
+
+    def test_retries_unmatched_locations_once_fuzzy_matching_is_enabled(self):
+        resolver = LocationResolver(self.mapping)
+        self.cities(resolver, ['Baltimroe, MD'])
+        learned = resolver.learned_mapping()
+        self.assertEqual(self.cities(LocationResolver(self.mapping, learned, fuzzy_cutoff=0.9), ['Baltimroe, MD']), ['Baltimore'])
+
+    def test_reports_unmatched_locations_with_their_response_counts(self):
+        resolver = LocationResolver(self.mapping)
+        self.assertEqual(self.cities(resolver, ['Paris, France', 'Paris, France', 'Baltimore, MD']), [nan, nan, 'Baltimore'])
+        resolver.resolve(pd.Series(['Paris, France']))
+        report = resolver.unmatched_report()
+        self.assertEqual(report['location'].tolist(), ['Paris, France'])
+        self.assertEqual(report['responses'].tolist(), [3])
+
+    def test_reuses_learned_resolutions(self):
+        resolver = LocationResolver(self.mapping, fuzzy_cutoff=0.9)
+        self.cities(resolver, ['Baltimroe, MD'])
+        learned = resolver.learned_mapping()
+        learned.loc[0, 'raw_location'] = 'New York, NY'
+        self.assertEqual(self.cities(LocationResolver(self.mapping, learned, fuzzy_cutoff=0.9), ['Baltimroe, MD']), ['New York'])
+
+    def test_retries_unmatched_locations_once_the_mapping_changes(self):
+        resolver = LocationResolver(self.mapping)
+        self.cities(resolver, ['Paris, France'])
+        learned = resolver.learned_mapping()
+        extended_mapping = pd.concat([self.mapping, pd.DataFrame({'raw_location': ['Paris, France'], 'city': ['Paris'], 'state': [nan]})])
+        self.assertEqual(self.cities(LocationResolver(extended_mapping, learned), ['paris france']), ['Paris'])
+
+    def test_mapping_rows_take_precedence_over_learned_fuzzy_matches(self):
+        resolver = LocationResolver(self.mapping, fuzzy_cutoff=0.8)
+        self.assertEqual(self.cities(resolver, ['Washington, WA']), ['Washington'])
+        learned = resolver.learned_mapping()
+        extended_mapping = pd.concat([self.mapping, pd.DataFrame({'raw_location': ['WASHINGTON WA'], 'city': ['Seattle'], 'state': ['Washington']})])
+        self.assertEqual(self.cities(LocationResolver(extended_mapping, learned, fuzzy_cutoff=0.8), ['Washington, WA']), ['Seattle'])
@@ -0,0 +1,122 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from typing import Tuple
+from unittest import mock
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fds_etl.benchmarks.synthetic import generate_dataset
+from fds_etl.src import main
+
+
+class TestLoadReferenceFrame(unittest.TestCase):
+
+    def test_rereads_a_file_that_changed_since_it_was_loaded(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, 'dropped_columns.csv')
+            config = {'dropped_columns_file': filepath}
+            with open(filepath, 'w') as f:
+                f.write('Survey Name\n')
+            self.assertEqual(main.read_dropped_columns(config), frozenset(['Survey Name']))
+            with open(filepath, 'w') as f:
+                f.write('Survey Title\n')
+            os.utime(filepath, ns=(0, os.stat(filepath).st_mtime_ns + 1))
+            self.assertEqual(main.read_dropped_columns(config), frozenset(['Survey Title']))
+
+
+class TestReadRawResponseData(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = {
+            'source_files': {'undergraduate': [self.write('ugrad.csv', 'Hopkins ID,College,Score,Survey Name\nA1,Arts,7,FDS\n')],
+                             'masters': [self.write('masters.csv', 'Hopkins ID,College,Score,Survey Name\nM1,Engineering,9,FDS\n')]},
+            'dropped_columns_file': self.write('dropped.csv', 'Survey Name\n'),
+        }
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, filename: str, content: str) -> str:
+        path = os.path.join(self.tempdir.name, filename)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_dropped_columns_are_never_read(self):
+        with mock.patch.object(pd, 'read_csv', wraps=pd.read_csv) as read_csv:
+            df = main.read_raw_response_data(self.config)
+        self.assertEqual(list(df.columns), ['College', 'Hopkins ID', 'Score', 'education_level'])
+        for call in read_csv.call_args_list:
+            self.assertFalse(call.kwargs['usecols']('Survey Name'))
+
+    def test_applies_the_column_dtypes_file(self):
+        self.config['column_dtypes_file'] = self.write('dtypes.csv', 'column,dtype\nScore,float32\n')
+        self.assertEqual(main.read_raw_response_data(self.config)['Score'].dtype, 'float32')
+
+    def test_categoricals_stay_categoricals_across_source_files(self):
+        self.config['column_dtypes_file'] = self.write('dtypes.csv', 'column,dtype\nCollege,category\n')
+        df = main.read_raw_response_data(self.config)
+        self.assertIsInstance(df['College'].dtype, pd.CategoricalDtype)
+        self.assertEqual(sorted(df['College'].cat.categories), ['Arts', 'Engineering'])
+        self.assertEqual(df['College'].tolist(), ['Arts', 'Engineering'])
+
+
+def _decategorize(df: pd.DataFrame) -> pd.DataFrame:
+    # with low_memory, which columns are categorical and in what category order depends on how the rows were chunked
+    return df.apply(lambda col: col.astype(object) if isinstance(col.dtype, pd.CategoricalDtype) else col)
+
+
+class TestExecuteModes(unittest.TestCase):
+    """Runs main.execute end to end on a small synthetic dataset and compares each mode with an in-memory run."""
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config = generate_dataset(self.tempdir.name, 300, seed=1)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def execute(self, name: str, **settings) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        output_dir = os.path.join(self.tempdir.name, name)
+        os.makedirs(output_dir, exist_ok=True)
+        config = dict(self.config, **settings)
+        config['longform_output_files'] = [os.path.join(output_dir, 'longform.parquet'), os.path.join(output_dir, 'longform.csv')]
+        config['shortform_output_files'] = [os.path.join(output_dir, 'shortform.parquet')]
+        with contextlib.redirect_stdout(io.StringIO()):
+            main.execute(config)
+        return pd.read_parquet(config['longform_output_files'][0]), pd.read_parquet(config['shortform_output_files'][0])
+
+    def assert_outputs_equal(self, outputs: Tuple[pd.DataFrame, pd.DataFrame], expected: Tuple[pd.DataFrame, pd.DataFrame]):
+        for df, expected_df in zip(outputs, expected):
+            assert_frame_equal(_decategorize(df), _decategorize(expected_df))
+
+    def test_incremental_runs_match_a_full_run_after_responses_change(self):
+        state_dir = os.path.join(self.tempdir.name, 'state')
+        self.execute('incremental', incremental_state_dir=state_dir)
+        source = self.config['source_files']['undergraduate'][0]
+        responses = pd.read_csv(source, dtype=str, keep_default_na=False)
+        ids = responses['Hopkins ID'].unique()
+        responses.loc[responses['Hopkins ID'] == ids[3], 'Outcome'] = 'Still Looking'
+        added = responses[responses['Hopkins ID'] == ids[5]].assign(**{'Hopkins ID': 'u-added'})
+        responses = responses[responses['Hopkins ID'] != ids[7]]
+        pd.concat([responses.iloc[:20], added, responses.iloc[20:]]).to_csv(source, index=False)
+
+        self.assert_outputs_equal(self.execute('incremental', incremental_state_dir=state_dir), self.execute('full'))
+
+    def test_streaming_runs_match_an_in_memory_run(self):
+        for settings in [{}, {'low_memory': True}, {'backend': 'arrow'}]:
+            with self.subTest(**settings):
+                self.assert_outputs_equal(self.execute('streaming', chunk_size=70, **settings), self.execute('in_memory', **settings))
+
+    def test_streaming_keeps_a_column_the_first_chunk_has_no_values_in(self):
+        streamed = self.execute('streaming', chunk_size=5)
+        fellowship_orgs = streamed[0]['fellowship_org']
+        self.assertTrue(fellowship_orgs.iloc[:5].isna().all() and fellowship_orgs.notna().any())
+        self.assert_outputs_equal(streamed, self.execute('in_memory'))
+        csv_columns = pd.read_csv(os.path.join(self.tempdir.name, 'streaming', 'longform.csv'), nrows=0).columns
+        self.assertEqual(list(csv_columns), list(streamed[0].columns))
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src.pipeline import Pipeline
+
+
+def add_one(df: pd.DataFrame) -> pd.DataFrame:
+    df['value'] = df['value'] + 1
+    return df
+
+
+def double(df: pd.DataFrame) -> pd.DataFrame:
+    df['value'] = df['value'] * 2
+    return df
+
+
+STAGES = [
+    ('read', lambda _: pd.DataFrame({'value': [1, 2]})),
+    ('add_one', add_one),
+    ('double', double),
+]
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_runs_every_stage_in_order(self):
+        assert_frame_equal(Pipeline(STAGES).run(None), pd.DataFrame({'value': [4, 6]}))
+
+    def test_stops_after_the_named_stage(self):
+        pipeline = Pipeline(STAGES)
+        assert_frame_equal(pipeline.run(None, stop='add_one'), pd.DataFrame({'value': [2, 3]}))
+        self.assertTrue(pipeline.stopped)
+
+    def test_starts_at_the_named_stage_with_the_given_frame(self):
+        assert_frame_equal(Pipeline(STAGES).run(pd.DataFrame({'value': [10]}), start='double'), pd.DataFrame({'value': [20]}))
+
+    def test_resumes_from_the_checkpoint_of_the_previous_stage(self):
+        Pipeline(STAGES, checkpoint_dir=self.tempdir.name).run(None, stop='add_one')
+        resumed = Pipeline(STAGES, checkpoint_dir=self.tempdir.name).run(None, start='double')
+        assert_frame_equal(resumed, pd.DataFrame({'value': [4, 6]}))
+
+    def test_resuming_without_a_checkpoint_raises(self):
+        with self.assertRaises(ValueError):
+            Pipeline(STAGES, checkpoint_dir=self.tempdir.name).run(None, start='double')
+
+    def test_unknown_stage_names_raise(self):
+        with self.assertRaises(ValueError):
+            Pipeline(STAGES).run(None, stop='triple')
+
+    def test_profiles_every_stage(self):
+        pipeline = Pipeline(STAGES, profile=True)
+        pipeline.run(None)
+        report = pipeline.profile_report()
+        self.assertEqual([entry['stage'] for entry in report], ['read', 'add_one', 'double'])
+        self.assertEqual(report[0]['rows_after'], 2)
+        self.assertEqual(report[1]['columns_before'], 1)
+
+    def test_accumulates_repeated_stages(self):
+        pipeline = Pipeline(STAGES, profile=True)
+        pipeline.run(pd.DataFrame({'value': [1]}), start='add_one')
+        pipeline.run(pd.DataFrame({'value': [1, 2]}), start='add_one')
+        entry = pipeline.profile_report()[0]
+        self.assertEqual(entry['calls'], 2)
+        self.assertEqual(entry['rows_before'], 3)
+
+    def test_writes_json_and_csv_reports(self):
+        pipeline = Pipeline(STAGES, profile=True)
+        pipeline.run(None)
+        json_path = os.path.join(self.tempdir.name, 'profile.json')
+        csv_path = os.path.join(self.tempdir.name, 'profile.csv')
+        pipeline.write_profile_report(json_path)
+        pipeline.write_profile_report(csv_path)
+        with open(json_path) as f:
+            self.assertEqual(len(json.load(f)), 3)
+        self.assertEqual(pd.read_csv(csv_path)['stage'].tolist(), ['read', 'add_one', 'double'])
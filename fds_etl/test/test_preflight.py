@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from fds_etl.src.preflight import SchemaPreflight, read_header
+
+
+class TestSchemaPreflight(unittest.TestCase):
+
+    def check(self, headers: dict, columns_to_drop=frozenset(), column_name_map=None, required_columns=None) -> pd.DataFrame:
+        checks = SchemaPreflight()
+        checks.check_source_headers(headers, columns_to_drop, column_name_map or {}, required_columns or {})
+        return checks.report()
+
+    def test_matching_headers_have_no_problems(self):
+        report = self.check({'a.csv': ['Outcome', 'junk']}, frozenset(['junk']), {'Outcome': 'outcome'}, {'recodes': ['outcome']})
+        self.assertTrue(report.empty)
+
+    def test_renamed_source_column_is_a_missing_required_column(self):
+        report = self.check({'a.csv': ['Outcome Status']}, column_name_map={'Outcome': 'outcome'}, required_columns={'recodes': ['outcome']})
+        errors = report[report['severity'] == 'error']
+        self.assertEqual(errors[['file', 'column']].values.tolist(), [['source_files', 'outcome']])
+        self.assertIn('recodes', errors['problem'].iloc[0])
+        self.assertEqual(report.loc[report['severity'] == 'warning', 'column'].tolist(), ['Outcome'])
+
+    def test_dropped_columns_missing_from_every_source_are_warnings(self):
+        report = self.check({'a.csv': ['Survey Title']}, frozenset(['Survey Name']))
+        self.assertEqual(report[['severity', 'file', 'column']].values.tolist(), [['warning', 'dropped_columns_file', 'Survey Name']])
+
+    def test_columns_renamed_onto_the_same_name_are_errors(self):
+        report = self.check({'a.csv': ['Location', 'location']}, column_name_map={'Location': 'location'})
+        self.assertEqual(report[['severity', 'column']].values.tolist(), [['error', 'location']])
+
+    def test_columns_missing_from_some_source_files_are_warnings(self):
+        report = self.check({'a.csv': ['outcome', 'pay'], 'b.csv': ['outcome']})
+        self.assertEqual(report[['severity', 'file', 'column']].values.tolist(), [['warning', 'b.csv', 'pay']])
+
+    def test_required_columns_in_only_some_source_files_are_warnings(self):
+        report = self.check({'a.csv': ['outcome', 'military_branch'], 'b.csv': ['outcome']}, required_columns={'recodes': ['military_branch']})
+        self.assertEqual(report[['severity', 'file', 'column']].values.tolist(), [['warning', 'b.csv', 'military_branch']])
+
+    def test_reference_headers_need_every_required_column(self):
+        checks = SchemaPreflight()
+        checks.check_reference_header('student_demographics_file', ['hopkins_id', 'is_urm'], ['hopkins_id', 'is_veteran'])
+        self.assertTrue(checks.has_errors())
+        self.assertEqual(checks.report()['column'].tolist(), ['is_veteran'])
+
+    def test_missing_files_are_errors(self):
+        checks = SchemaPreflight()
+        self.assertFalse(checks.check_files_exist({'location_mapping_file': '/does/not/exist.xlsx'}))
+        self.assertTrue(checks.has_errors())
+
+
+class TestReadHeader(unittest.TestCase):
+
+    def test_reads_csv_and_excel_headers(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            df = pd.DataFrame({'hopkins_id': ['a', 'b'], 'is_urm': [1, 0]})
+            df.to_csv(os.path.join(temp_dir, 'a.csv'), index=False)
+            df.to_excel(os.path.join(temp_dir, 'a.xlsx'), index=False)
+            self.assertEqual(read_header(os.path.join(temp_dir, 'a.csv')), ['hopkins_id', 'is_urm'])
+            self.assertEqual(read_header(os.path.join(temp_dir, 'a.xlsx')), ['hopkins_id', 'is_urm'])
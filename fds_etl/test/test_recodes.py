@@ -0,0 +1,76 @@
+import unittest
+
+import pandas as pd
+from numpy import nan
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src.recodes import RecodeRules
+
+
+class TestRecodeRules(unittest.TestCase):
+
+    def test_later_rules_see_and_overwrite_earlier_assignments(self):
+        rules = RecodeRules([
+            {'when': {'column': 'outcome', 'equals': 'Working'}, 'set': {'outcome': 'Employed'}},
+            {'when': {'column': 'outcome', 'equals': 'Employed'}, 'set': {'outcome': 'Employed (Recoded)', 'note': 'second'}},
+            {'when': {'column': 'outcome', 'equals': 'Working'}, 'set': {'note': 'unreachable'}},
+        ])
+        df = pd.DataFrame({'outcome': ['Working', 'Volunteering'], 'note': [nan, nan]})
+        expected = pd.DataFrame({'outcome': ['Employed (Recoded)', 'Volunteering'], 'note': ['second', nan]})
+        assert_frame_equal(rules.apply(df), expected)
+
+    def test_values_of_a_rule_are_computed_before_it_assigns_any(self):
+        rules = RecodeRules([{'when': {'column': 'a', 'not_blank': True}, 'set': {'a': {'column': 'b'}, 'b': {'column': 'a'}}}])
+        assert_frame_equal(rules.apply(pd.DataFrame({'a': ['x', ''], 'b': ['y', 'z']})), pd.DataFrame({'a': ['y', ''], 'b': ['x', 'z']}))
+
+    def test_combines_conditions(self):
+        rules = RecodeRules([{
+            'when': {'all': [{'column': 'a', 'in': [1, 2]}, {'any': [{'column': 'b', 'equals': 'x'}, {'column': 'c', 'equals': True}]}]},
+            'set': {'hit': True},
+        }])
+        df = pd.DataFrame({'a': [1, 2, 3, 1], 'b': ['x', 'y', 'x', nan], 'c': [False, True, True, False]})
+        self.assertEqual(rules.apply(df)['hit'].fillna(False).tolist(), [True, True, False, False])
+
+    def test_concatenation_propagates_missing_values(self):
+        rules = RecodeRules([{'when': {'column': 'a', 'not_blank': True}, 'set': {'c': {'concat': [{'column': 'a'}, ' ', {'column': 'b'}]}}}])
+        df = pd.DataFrame({'a': ['Major', 'Captain'], 'b': ['Smith', nan], 'c': [nan, nan]})
+        self.assertEqual(rules.apply(df)['c'].tolist()[0], 'Major Smith')
+        self.assertTrue(pd.isna(rules.apply(df)['c'][1]))
+
+    def test_assigns_new_values_to_categorical_columns(self):
+        rules = RecodeRules([{'when': {'column': 'outcome', 'equals': 'Working'}, 'set': {'outcome': 'Working (Full-Time)'}}])
+        df = pd.DataFrame({'outcome': pd.Categorical(['Working', 'Volunteering'])})
+        recoded_df = rules.apply(df)
+        self.assertEqual(recoded_df['outcome'].dtype, 'category')
+        self.assertEqual(recoded_df['outcome'].tolist(), ['Working (Full-Time)', 'Volunteering'])
+
+    def test_rules_that_match_no_row_still_create_the_columns_they_assign(self):
+        rules = RecodeRules([
+            {'when': {'column': 'outcome', 'equals': 'Fellowship'}, 'set': {'fellowship_org': {'column': 'employer_name'}}},
+            {'when': {'column': 'outcome', 'equals': 'Working'}, 'set': {'employment_type': 'Full-Time'}},
+        ])
+        with_fellowship = rules.apply(pd.DataFrame({'outcome': ['Fellowship', 'Working'], 'employer_name': ['Fulbright', 'Acme']}))
+        without_fellowship = rules.apply(pd.DataFrame({'outcome': ['Working', 'Working'], 'employer_name': ['Acme', 'Acme']}))
+        self.assertEqual(list(without_fellowship.columns), list(with_fellowship.columns))
+        self.assertEqual(without_fellowship['fellowship_org'].dtype, with_fellowship['fellowship_org'].dtype)
+        self.assertTrue(without_fellowship['fellowship_org'].isna().all())
+
+    def test_drops_columns_once_all_rules_have_run(self):
+        rules = RecodeRules([
+            {'when': {'column': 'a', 'equals': 1}, 'set': {'b': 'one'}, 'drop': ['a']},
+            {'when': {'column': 'a', 'equals': 2}, 'set': {'b': 'two'}},
+        ])
+        assert_frame_equal(rules.apply(pd.DataFrame({'a': [1, 2], 'b': [nan, nan]})), pd.DataFrame({'b': ['one', 'two']}))
+
+    def test_rejects_malformed_rules(self):
+        with self.assertRaises(ValueError):
+            RecodeRules([{'when': {'column': 'a', 'matches': 'x'}, 'set': {'b': 1}}])
+        with self.assertRaises(ValueError):
+            RecodeRules([{'when': {'column': 'a', 'equals': 'x'}}])
+
+    def test_requires_columns_that_are_read_or_dropped_before_being_assigned(self):
+        rules = RecodeRules([
+            {'when': {'any': [{'column': 'a', 'equals': 1}, {'column': 'b', 'not_blank': True}]},
+             'set': {'c': {'concat': [{'column': 'd'}, ' ']}, 'e': 'x'}, 'drop': ['f', 'e']},
+        ])
+        self.assertEqual(rules.required_columns, ['a', 'b', 'd', 'f'])
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src.reference_cache import ReferenceCache
+
+
+class TestReferenceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = ReferenceCache(os.path.join(self.tempdir.name, 'cache'))
+        self.source = os.path.join(self.tempdir.name, 'source.csv')
+        self.write_source('hopkins_id\nABC\n')
+        self.loads = 0
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write_source(self, content: str, mtime: float = None):
+        with open(self.source, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.source, (mtime, mtime))
+
+    def loader(self, filepath: str) -> pd.DataFrame:
+        self.loads += 1
+        df = pd.read_csv(filepath)
+        df['hopkins_id'] = df['hopkins_id'].str.lower()
+        return df
+
+    def test_returns_the_normalized_frame(self):
+        assert_frame_equal(self.cache.load_frame(self.source, 'ids', self.loader), pd.DataFrame({'hopkins_id': ['abc']}))
+
+    def test_reuses_the_cached_frame_when_the_source_is_unchanged(self):
+        self.cache.load_frame(self.source, 'ids', self.loader)
+        assert_frame_equal(self.cache.load_frame(self.source, 'ids', self.loader), pd.DataFrame({'hopkins_id': ['abc']}))
+        self.assertEqual(self.loads, 1)
+
+    def test_reuses_the_cached_frame_when_only_the_mtime_changed(self):
+        self.cache.load_frame(self.source, 'ids', self.loader)
+        self.write_source('hopkins_id\nABC\n', mtime=1000)
+        self.cache.load_frame(self.source, 'ids', self.loader)
+        self.assertEqual(self.loads, 1)
+
+    def test_reloads_when_the_content_changed(self):
+        self.cache.load_frame(self.source, 'ids', self.loader)
+        self.write_source('hopkins_id\nXYZ\n', mtime=1000)
+        assert_frame_equal(self.cache.load_frame(self.source, 'ids', self.loader), pd.DataFrame({'hopkins_id': ['xyz']}))
+        self.assertEqual(self.loads, 2)
+
+    def test_keeps_separate_entries_per_loader_name(self):
+        self.cache.load_frame(self.source, 'ids', self.loader)
+        self.cache.load_frame(self.source, 'other_ids', self.loader)
+        self.assertEqual(self.loads, 2)
+
+    def test_evicts_least_recently_used_entries_beyond_the_size_limit(self):
+        cache = ReferenceCache(os.path.join(self.tempdir.name, 'small_cache'), max_bytes=1)
+        cache.load_frame(self.source, 'ids', self.loader)
+        cache.load_frame(self.source, 'other_ids', self.loader)
+        cache.load_frame(self.source, 'ids', self.loader)
+        self.assertEqual(self.loads, 3)
+        self.assertEqual(len([f for f in os.listdir(cache.cache_dir) if f.endswith('.parquet')]), 1)
+
+    def test_returns_frames_parquet_cannot_store_without_caching_them(self):
+        mixed = pd.DataFrame({'raw_location': ['Baltimore, MD', 12345]}, dtype=object)
+        self.assertIs(self.cache.load_frame(self.source, 'mixed', lambda _: mixed), mixed)
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_reloads_an_entry_evicted_by_another_process(self):
+        self.cache.load_frame(self.source, 'ids', self.loader)
+        for filename in os.listdir(self.cache.cache_dir):
+            if filename.endswith('.parquet'):
+                os.remove(os.path.join(self.cache.cache_dir, filename))
+        assert_frame_equal(self.cache.load_frame(self.source, 'ids', self.loader), pd.DataFrame({'hopkins_id': ['abc']}))
+        self.assertEqual(self.loads, 2)
@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src.summary import SummaryCube
+
+
+def responses(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=['jhu_college', 'jhu_major', 'is_urm', 'outcome', 'avg_ldl_nps'])
+    df['is_urm'] = df['is_urm'].astype('boolean')
+    df['is_submitted'] = df['outcome'].notna()
+    df['min_ldl_nps'] = df['avg_ldl_nps'] - 1
+    df['max_ldl_nps'] = df['avg_ldl_nps'] + 1
+    return df
+
+
+ROWS = [
+    ('Arts & Sciences', 'Biology', True, 'Working', 8.0),
+    ('Arts & Sciences', 'Biology', False, 'Fellowship', np.nan),
+    ('Arts & Sciences', 'History', None, None, 4.0),
+    ('Engineering', 'Computer Science', False, 'Working', 6.0),
+]
+
+
+class TestSummaryCube(unittest.TestCase):
+
+    def setUp(self):
+        self.cube = SummaryCube(['jhu_college', 'jhu_major', 'is_urm'])
+        self.df = responses(ROWS)
+
+    def summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.cube.rollup(self.cube.aggregate(df))
+
+    def test_grand_total_covers_every_row(self):
+        total = self.summary(self.df).iloc[0]
+        self.assertEqual(total['grouped_by'], '')
+        self.assertEqual(total[['responses', 'submitted', 'known_outcomes', 'nps_responses']].tolist(), [4, 3, 3, 3])
+        self.assertEqual(total['knowledge_rate'], 0.75)
+        self.assertEqual(total[['avg_ldl_nps', 'min_ldl_nps', 'max_ldl_nps']].tolist(), [6.0, 3.0, 9.0])
+        self.assertEqual(total[['outcome: Fellowship', 'outcome: Working']].tolist(), [1, 2])
+
+    def test_has_a_row_for_every_group_of_every_grouping_set(self):
+        summary = self.summary(self.df)
+        self.assertEqual(summary['grouped_by'].value_counts()['jhu_college,is_urm'], 4)
+        biology = summary[(summary['grouped_by'] == 'jhu_major') & (summary['jhu_major'] == 'Biology')].iloc[0]
+        self.assertTrue(pd.isna(biology['jhu_college']))
+        self.assertEqual(biology[['responses', 'outcome: Working', 'outcome: Fellowship']].tolist(), [2, 1, 1])
+
+    def test_every_grouping_set_adds_up_to_the_total(self):
+        summary = self.summary(self.df)
+        self.assertTrue((summary.groupby('grouped_by')['responses'].sum() == len(self.df)).all())
+
+    def test_missing_dimension_values_are_their_own_group(self):
+        summary = self.summary(self.df)
+        unknown = summary[(summary['grouped_by'] == 'is_urm') & summary['is_urm'].isna()]
+        self.assertEqual(unknown['responses'].tolist(), [1])
+
+    def test_limits_the_number_of_grouped_dimensions(self):
+        cube = SummaryCube(['jhu_college', 'jhu_major', 'is_urm'], max_grouped_dimensions=1)
+        summary = cube.rollup(cube.aggregate(self.df))
+        self.assertEqual(summary['grouped_by'].unique().tolist(), ['', 'jhu_college', 'jhu_major', 'is_urm'])
+
+    def test_merging_chunk_cells_matches_aggregating_all_rows(self):
+        cells = self.cube.merge([self.cube.aggregate(self.df.iloc[:2]), self.cube.aggregate(self.df.iloc[2:])])
+        assert_frame_equal(self.cube.rollup(cells), self.summary(self.df))
+
+    def test_updating_changed_cells_matches_aggregating_all_rows(self):
+        cells = self.cube.aggregate(self.df)
+        changed = responses([('Engineering', 'Computer Science', False, 'Fellowship', 2.0)])
+        new = responses([('Engineering', 'Mechanical Engineering', True, 'Working', 9.0)])
+        df = pd.concat([self.df.iloc[:3], changed, new], ignore_index=True)
+        cells = self.cube.update(cells, df, [self.df.iloc[[3]], changed, new])
+        assert_frame_equal(self.cube.rollup(cells), self.summary(df), check_dtype=False)
+
+    def test_rejects_dimensions_that_are_not_columns(self):
+        with self.assertRaises(ValueError):
+            SummaryCube(['jhu_degree']).aggregate(self.df)
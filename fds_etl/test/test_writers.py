@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from numpy import nan
+from pandas.testing import assert_frame_equal
+
+from fds_etl.src import writers
+
+
+class TestGroupTargetsByFormat(unittest.TestCase):
+
+    def test_infers_format_from_extension(self):
+        self.assertEqual(writers.group_targets_by_format(['a.xlsx', 'b.CSV', 'c.parquet']),
+                         {'xlsx': ['a.xlsx'], 'csv': ['b.CSV'], 'parquet': ['c.parquet']})
+
+    def test_explicit_format_overrides_extension(self):
+        self.assertEqual(writers.group_targets_by_format([{'path': 'a.dat', 'format': 'csv'}, 'b.csv']),
+                         {'csv': ['a.dat', 'b.csv']})
+
+    def test_unknown_formats_raise(self):
+        with self.assertRaises(ValueError):
+            writers.group_targets_by_format(['a.txt'])
+        with self.assertRaises(ValueError):
+            writers.group_targets_by_format([{'path': 'a.csv', 'format': 'feather'}])
+
+
+class TestWriteOutputs(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.df = pd.DataFrame({'name': ['a', None, 'c'], 'score': [1.5, nan, 3.0]})
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.tempdir.name, filename)
+
+    def test_writes_every_destination_of_every_format(self):
+        writers.write_outputs([(self.df, [self.path('a.csv'), self.path('b.csv'), self.path('c.parquet'), self.path('d.xlsx')])])
+        assert_frame_equal(pd.read_csv(self.path('a.csv')), self.df)
+        assert_frame_equal(pd.read_csv(self.path('b.csv')), self.df)
+        assert_frame_equal(pd.read_parquet(self.path('c.parquet')), self.df)
+        assert_frame_equal(pd.read_excel(self.path('d.xlsx')), self.df)
+
+    def test_parquet_keeps_integer_columns_of_a_whole_frame(self):
+        df = self.df.assign(count=[1, 2, 3])
+        writers.write_outputs([(df, [self.path('a.parquet')])])
+        assert_frame_equal(pd.read_parquet(self.path('a.parquet')), df)
+
+    def test_streaming_writer_matches_writing_the_whole_frame(self):
+        targets = [self.path('a.csv'), self.path('b.parquet'), self.path('c.xlsx')]
+        with writers.StreamingOutputWriter(targets) as writer:
+            writer.write(self.df.iloc[:1])
+            writer.write(self.df.iloc[1:])
+        assert_frame_equal(pd.read_csv(self.path('a.csv')), self.df)
+        assert_frame_equal(pd.read_parquet(self.path('b.parquet')), self.df)
+        assert_frame_equal(pd.read_excel(self.path('c.xlsx')), self.df)
+
+    def test_streaming_parquet_accepts_text_in_a_column_that_started_blank(self):
+        with writers.StreamingOutputWriter([self.path('a.parquet')]) as writer:
+            writer.write(pd.DataFrame({'name': [None], 'count': [1]}))
+            writer.write(pd.DataFrame({'name': ['b'], 'count': [nan]}))
+        self.assertEqual(pd.read_parquet(self.path('a.parquet'))['name'].tolist(), [None, 'b'])
+
+    def test_streaming_writer_rejects_chunks_with_other_columns(self):
+        with writers.StreamingOutputWriter([self.path('a.csv')]) as writer:
+            writer.write(self.df.iloc[:1])
+            writer.write(self.df.iloc[1:2][['score', 'name']])
+            with self.assertRaises(ValueError):
+                writer.write(self.df.iloc[2:].assign(fellowship_org='Fulbright'))
+        assert_frame_equal(pd.read_csv(self.path('a.csv')), self.df.iloc[:2])
+
+    def test_excel_rows_past_the_last_row_of_a_sheet_raise(self):
+        writer = writers.XlsxChunkWriter(self.path('a.xlsx'))
+        writer.write(self.df.iloc[:1])
+        writer._next_row = writers.XLSX_MAX_ROWS - 1
+        with self.assertRaises(ValueError):
+            writer.write(self.df.iloc[1:])
+        writer.write(self.df.iloc[1:2])
+        writer.close()
+        self.assertEqual(writer._next_row, writers.XLSX_MAX_ROWS)
+
+
+class TestColumnFormats(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({'is_urm': pd.array([True, False, None], dtype='boolean'), 'score': [1.5, nan, 3.0]})
+
+    def test_renders_booleans_and_missing_values_only_for_the_rule_formats(self):
+        rules = [{'columns': ['is_urm', 'not_in_frame'], 'formats': ['xlsx'], 'true': 'Y', 'false': 'N', 'missing': '?'}]
+        self.assertEqual(writers.render_columns(self.df, rules, 'xlsx')['is_urm'].tolist(), ['Y', 'N', '?'])
+        assert_frame_equal(writers.render_columns(self.df, rules, 'parquet'), self.df)
+
+    def test_rules_default_to_excel_friendly_strings_in_excel(self):
+        self.assertEqual(writers.render_columns(self.df, [{'columns': ['is_urm']}], 'xlsx')['is_urm'].tolist(), ['TRUE', 'FALSE', ''])
+
+    def test_typed_outputs_keep_booleans_and_excel_outputs_are_rendered(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = [os.path.join(temp_dir, 'a.parquet'), os.path.join(temp_dir, 'a.xlsx')]
+            writers.write_outputs([(self.df, paths)], column_formats=[{'columns': ['is_urm']}])
+            assert_frame_equal(pd.read_parquet(paths[0]), self.df)
+            self.assertEqual(pd.read_excel(paths[1], keep_default_na=False)['is_urm'].tolist(), ['TRUE', 'FALSE', ''])
+
+    def test_invalid_rules_raise(self):
+        with self.assertRaises(ValueError):
+            writers.validate_column_formats([{'formats': ['xlsx']}])
+        with self.assertRaises(ValueError):
+            writers.validate_column_formats([{'columns': ['a'], 'formats': ['pdf']}])
+        with self.assertRaises(ValueError):
+            writers.validate_column_formats([{'columns': ['a'], 'yes': 'Y'}])